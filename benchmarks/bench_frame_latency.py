@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Measures latency from a tracker frame to the game state update through three pipeline stages (tracker, state, game),
+with the old set/sleep/clear Event chaining and with FrameBroadcast.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_latency [fps] [seconds]
+"""
+import statistics
+import sys
+from timeit import default_timer as timer
+
+import gevent
+from gevent.event import Event
+
+from src.servers.Server import FrameBroadcast
+
+
+def event_pipeline(fps: float, seconds: float):
+    frames = []
+    latencies = []
+    tracker_updated, state_updated = Event(), Event()
+
+    def camera():
+        while True:
+            frames.append(timer())
+            gevent.sleep(1 / fps)
+
+    def tracker():
+        read = 0
+        while True:
+            # Polls the queue every 10 ms
+            if read < len(frames):
+                read += 1
+                tracker_updated.set()
+            gevent.sleep(0.01)
+            tracker_updated.clear()
+
+    def state():
+        while True:
+            tracker_updated.wait()
+            state_updated.set()
+            gevent.sleep(0.01)
+            state_updated.clear()
+
+    def game():
+        while True:
+            state_updated.wait()
+            latencies.append(timer() - frames[-1])
+            gevent.sleep(0.01)
+
+    return run([camera, tracker, state, game], frames, latencies, seconds)
+
+
+def broadcast_pipeline(fps: float, seconds: float):
+    frames = []
+    latencies = []
+    tracker_updated, state_updated = FrameBroadcast(), FrameBroadcast()
+
+    def camera():
+        while True:
+            frames.append(timer())
+            # Stands in for the blocking read in TrackerServer waking up
+            tracker_updated.publish()
+            gevent.sleep(1 / fps)
+
+    def state():
+        seq = 0
+        while True:
+            seq = tracker_updated.wait(seq)
+            state_updated.publish()
+
+    def game():
+        seq = 0
+        while True:
+            seq = state_updated.wait(seq)
+            latencies.append(timer() - frames[-1])
+
+    return run([camera, state, game], frames, latencies, seconds)
+
+
+def run(stages, frames, latencies, seconds):
+    greenlets = [gevent.spawn(stage) for stage in stages]
+    gevent.sleep(seconds)
+    gevent.killall(greenlets)
+    return len(frames), latencies
+
+
+def main(argv):
+    fps = float(argv[0]) if len(argv) > 0 else 30
+    seconds = float(argv[1]) if len(argv) > 1 else 5
+
+    for name, pipeline in [('set/sleep/clear Event', event_pipeline), ('FrameBroadcast', broadcast_pipeline)]:
+        produced, latencies = pipeline(fps, seconds)
+        latencies_ms = sorted(latency * 1000 for latency in latencies)
+        print(name)
+        print(f'  frames produced {produced}, game updates {len(latencies)}')
+        print(f'  latency mean {statistics.mean(latencies_ms):.2f} ms, '
+              f'p99 {latencies_ms[int(len(latencies_ms) * 0.99)]:.2f} ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Compares check_if_object_in_area with FieldIndex on one frame worth of points.
+
+Run from the repository root:
+    python -m benchmarks.bench_geometry
+"""
+import numpy as np
+
+from benchmarks.common import measure, random_fields, random_positions, report
+from src.classes.FieldIndex import FieldIndex
+from src.utils import check_if_object_in_area
+
+
+def main():
+    for n_points, n_fields in [(15, 5), (100, 10), (500, 20)]:
+        fields = random_fields(n_fields)
+        positions = random_positions(n_points)
+        points = np.array([p.to_tuple() for p in positions])
+
+        index = FieldIndex()
+        index.update(fields)
+
+        expected = np.array([[check_if_object_in_area(p, f) for f in fields.values()] for p in positions])
+        assert (index.contains(points) == expected).all()
+
+        def current():
+            for p in positions:
+                for f in fields.values():
+                    check_if_object_in_area(p, f)
+
+        report(f'{n_points} points x {n_fields} fields', [
+            ('check_if_object_in_area', measure(current)),
+            ('FieldIndex.update (unchanged fields)', measure(lambda: index.update(fields))),
+            ('FieldIndex.contains', measure(lambda: index.contains(points))),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Measures how long a log call blocks the calling greenlet with a FileHandler and StreamHandler attached per game, the
+way create_logger used to work, and with the shared queue pipeline.
+
+Run from the repository root:
+    python -m benchmarks.bench_logging [games]
+"""
+import logging
+import os
+import sys
+import tempfile
+
+from benchmarks.common import measure, report
+from src.utils import create_logger, logging_stats, setup_logging
+
+
+def per_game_handlers(games: int, path: str) -> logging.Logger:
+    logger = logging.getLogger('bench.per_game')
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for _ in range(games):
+        file_handler = logging.FileHandler(path)
+        console_handler = logging.StreamHandler(open(os.devnull, 'w'))
+        file_handler.setFormatter(formatter)
+        console_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+    return logger
+
+
+def main(argv):
+    games = int(argv[0]) if argv else 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        old = per_game_handlers(games, os.path.join(directory, 'per-game.log'))
+
+        # Console output of the pipeline goes to stderr, keep it out of the report
+        stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+        setup_logging(log_path=os.path.join(directory, 'queue.log'))
+        new = create_logger('bench.queue', 'DEBUG')
+        for _ in range(games):
+            new = create_logger('bench.queue', 'DEBUG')
+
+        rows = [
+            (f'{games} handler pairs, info', measure(lambda: old.info('Robot %s is in %s', 5, 'blue_plastic'), 3)),
+            ('queue pipeline, info', measure(lambda: new.info('Robot %s is in %s', 5, 'blue_plastic'), 3)),
+        ]
+        sys.stderr = stderr
+
+        report('Time a log call blocks the caller', rows)
+        print('Queue pipeline:', logging_stats())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the per-frame cost of StateLiveData.parse with the parse that rebuilt the dicts on every frame.
+
+Run from the repository root:
+    python -m benchmarks.bench_state_parse
+"""
+from benchmarks.common import measure, report, synthetic_config, synthetic_frame
+from src.classes.StateLiveData import StateLiveData
+
+
+def rebuild_parse(state: StateLiveData, data):
+    """StateLiveData.parse before the category index"""
+    state.fields = data.fields
+    state.robots = {}
+    state.objects = {}
+    state.timestamp = data.timestamp
+
+    for key, obj in data.objects.items():
+        if key in state.config['robots']:
+            state.robots[key] = obj
+        else:
+            for object_type in state.config['objects']:
+                if object_type not in state.objects:
+                    state.objects[object_type] = {}
+                if key in state.config['objects'][object_type]:
+                    state.objects[object_type][key] = obj
+
+
+def main():
+    for robots, object_types, objects_per_type in [(10, 3, 5), (20, 5, 20), (50, 10, 50)]:
+        config = synthetic_config(robots, object_types, objects_per_type)
+        frames = [synthetic_frame(config, seed) for seed in range(2)]
+
+        reference = StateLiveData(config)
+        state = StateLiveData(config)
+
+        def before():
+            for frame in frames:
+                rebuild_parse(reference, frame)
+
+        def after():
+            for frame in frames:
+                state.parse(frame)
+
+        report(f'{robots} robots, {object_types} x {objects_per_type} objects (per frame)', [
+            ('rebuild', measure(before) / len(frames)),
+            ('indexed, in place', measure(after) / len(frames)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
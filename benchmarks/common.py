@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import random
+from timeit import Timer
+from typing import Callable, Dict, List, Tuple
+
+ARENA_WIDTH = 3600
+ARENA_HEIGHT = 2100
+
+
+class Corners:
+    """Field stand-in that only exposes corners, the way check_if_object_in_area and FieldIndex read them"""
+
+    def __init__(self, top_left, top_right, bottom_right, bottom_left):
+        self.corners = (top_left, top_right, bottom_right, bottom_left)
+
+    def to_tuple(self):
+        return self.corners
+
+
+class Position:
+    """Point stand-in that only exposes coordinates"""
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    def to_tuple(self):
+        return self.x, self.y
+
+
+def random_fields(count: int, seed: int = 0) -> Dict[str, Corners]:
+    rnd = random.Random(seed)
+    result = {}
+    for i in range(count):
+        x = rnd.uniform(0, ARENA_WIDTH - 500)
+        y = rnd.uniform(0, ARENA_HEIGHT - 500)
+        w = rnd.uniform(200, 500)
+        h = rnd.uniform(200, 500)
+        result[f'field_{i}'] = Corners((x, y + h), (x + w, y + h), (x + w, y), (x, y))
+    return result
+
+
+def random_positions(count: int, seed: int = 1) -> List[Position]:
+    rnd = random.Random(seed)
+    return [Position(rnd.uniform(0, ARENA_WIDTH), rnd.uniform(0, ARENA_HEIGHT)) for _ in range(count)]
+
+
+def measure(func: Callable, repeat: int = 5) -> float:
+    """
+    Measures a function call
+    :param func: function without arguments
+    :param repeat: number of timing runs, the best one is reported
+    :return: seconds per call
+    """
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def report(title: str, rows: List[Tuple[str, float]]):
+    print(title)
+    for name, seconds in rows:
+        print(f'  {name:<40} {seconds * 1e6:12.2f} us')
+
+
+class Frame:
+    """TrackerLiveData stand-in with only the attributes StateLiveData reads"""
+
+    def __init__(self, objects, fields, timestamp):
+        self.objects = objects
+        self.fields = fields
+        self.timestamp = timestamp
+
+
+class Marker:
+    """ObjectTracker stand-in with only the attributes the server reads"""
+
+    def __init__(self, oid: int, position: Position, direction: float):
+        self.id = oid
+        self.position = position
+        self.direction = direction
+
+    def to_json(self):
+        return {'id': self.id, 'position': self.position.to_tuple(), 'direction': self.direction}
+
+
+def synthetic_config(robots: int, object_types: int, objects_per_type: int) -> dict:
+    return {
+        'robots': {robot_id: f'Team {robot_id}' for robot_id in range(robots)},
+        'objects': {
+            f'type_{t}': [robots + t * objects_per_type + o for o in range(objects_per_type)]
+            for t in range(object_types)
+        },
+        'fields_names': [],
+    }
+
+
+def synthetic_frame(config: dict, seed: int = 0, fields: dict = None) -> Frame:
+    """
+    Builds a frame with every configured marker at a random position
+    """
+    ids = list(config['robots']) + [o for objects in config['objects'].values() for o in objects]
+    positions = random_positions(len(ids), seed)
+    return Frame(
+        {oid: Marker(oid, position, 0.0) for oid, position in zip(ids, positions)},
+        fields if fields is not None else {},
+        float(seed)
+    )
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Load test emulating a competition day: many parallel games, each with two robots polling the game state, spectators
+and a referee.
+
+Starts the game server on a synthetic or replayed tracker in a separate process, creates the games through the REST
+API and reports throughput, p50/p99 latency and error rates per client role, together with the age of the frames the
+robots received. Run from the repository root:
+    python -m benchmarks.load --game beach --games 10 --duration 30
+    python -m benchmarks.load --game beach --games 10 --replay match.frames
+    python -m benchmarks.load --url http://localhost:8088 --games 10
+
+With --url the load goes to a server that is already running.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse
+import base64
+import http.client
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import gevent
+import orjson
+
+
+class Stats:
+    """Latencies and errors of one client role
+
+    Requests that failed without a response count as errors, like 4xx and 5xx responses, but have no latency.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.failures: int = 0
+        self.statuses: Dict[int, int] = {}
+
+    def add(self, latency: float, status: Optional[int]):
+        if status is None:
+            self.failures += 1
+            return
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(latency)
+
+    def summary(self, duration: float) -> Dict:
+        attempts = len(self.latencies) + self.failures
+        successes = sum(count for status, count in self.statuses.items() if status < 400)
+        errors = attempts - successes
+        return {
+            'requests': attempts,
+            'responses': len(self.latencies),
+            'throughput': successes / duration,
+            'response_throughput': len(self.latencies) / duration,
+            'p50': percentile(self.latencies, 50),
+            'p99': percentile(self.latencies, 99),
+            'max': max(self.latencies, default=None),
+            'errors': errors,
+            'failures': self.failures,
+            'error_rate': errors / attempts if attempts else 0.0,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class Client:
+    """Keep-alive HTTP connection that records every request in a Stats"""
+
+    def __init__(self, url: str, stats: Stats, auth: Optional[str] = None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.stats = stats
+        self.headers = {'Content-Type': 'application/json'}
+        if auth is not None:
+            self.headers['Authorization'] = 'Basic ' + base64.b64encode(auth.encode('utf-8')).decode('ascii')
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body=None) -> Optional[bytes]:
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.connection.request(
+                method, path, body=json.dumps(body) if body is not None else None, headers=self.headers
+            )
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.stats.add(time.perf_counter() - started, None)
+            self.close()
+            return None
+
+        self.stats.add(time.perf_counter() - started, response.status)
+        return data if response.status < 400 else None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def paced(rate: float, until: float):
+    """
+    Yields at a fixed rate until the deadline, skipping slots that were missed instead of bursting
+    """
+    period = 1 / rate
+    # Spread clients over the period, so they do not all poll at once
+    slot = time.time() + random.uniform(0, period)
+    while slot < until:
+        delay = slot - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        yield
+        slot += period
+        now = time.time()
+        if slot < now:
+            slot += (now - slot) // period * period + period
+
+
+def robot(url: str, game: Dict, rate: float, until: float, stats: Stats, ages: List[float]):
+    client = Client(url, stats, f'{game["game_id"]}:{game["password"]}')
+    path = f'/game/{game["game_id"]}'
+    for _ in paced(rate, until):
+        data = client.request('GET', path)
+        if data is not None:
+            timestamp = orjson.loads(data).get('timestamp')
+            if isinstance(timestamp, (int, float)):
+                ages.append(time.time() - timestamp)
+    client.close()
+
+
+def spectator(url: str, game: Dict, rate: float, until: float, stats: Stats):
+    client = Client(url, stats)
+    path = f'/game/{game["game_id"]}'
+    for _ in paced(rate, until):
+        client.request('GET', path)
+    client.close()
+
+
+def referee(url: str, game: Dict, interval: float, until: float, stats: Stats):
+    """
+    Starts the game and then pauses, resumes or alters the score at random
+    """
+    client = Client(url, stats, f'{game["game_id"]}:{game["password"]}')
+    client.request('PUT', '/game/time', {'game_time': int(until - time.time()) + 60})
+    client.request('PUT', '/game/start')
+    paused = False
+    for _ in paced(1 / interval, until):
+        if paused or random.random() < 0.2:
+            client.request('PUT', '/game/pause')
+            paused = not paused
+        else:
+            client.request('PUT', '/game/score', {str(random.choice(game['teams'])): random.choice((-1, 1))})
+    client.close()
+
+
+def start_server(args) -> subprocess.Popen:
+    command = [sys.executable, 'main.py', '--game', args.game, '--port', str(args.port)]
+    if args.replay is not None:
+        command += ['--replay', args.replay, '--replay-speed', str(args.replay_speed)]
+    else:
+        command += ['--source', 'synthetic', '--fps', str(args.fps)]
+        if args.robots is not None:
+            command += ['--robots', str(args.robots)]
+        if args.objects is not None:
+            command += ['--objects', str(args.objects)]
+    if args.workers:
+        command += ['--workers', str(args.workers)]
+    if args.shards:
+        command += ['--shards', str(args.shards)]
+
+    log = open(args.server_log, 'wb') if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_for_server(url: str, timeout: float, server: Optional[subprocess.Popen] = None) -> List[int]:
+    """
+    Waits until the server answers and returns the team ids
+    """
+    deadline = time.time() + timeout
+    client = Client(url, Stats())
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f'Server exited with code {server.returncode}')
+        data = client.request('GET', '/team/')
+        if data is not None:
+            client.close()
+            return [team['id'] for team in orjson.loads(data)]
+        gevent.sleep(0.5)
+    raise RuntimeError(f'Server at {url} did not answer in {timeout} seconds')
+
+
+def create_games(url: str, teams: List[int], count: int, stats: Stats) -> List[Dict]:
+    client = Client(url, stats)
+    games = []
+    for i in range(count):
+        pair = [teams[(2 * i) % len(teams)], teams[(2 * i + 1) % len(teams)]]
+        data = client.request('POST', '/game/', {'team_1': pair[0], 'team_2': pair[1]})
+        if data is not None:
+            game = orjson.loads(data)
+            game['teams'] = pair
+            games.append(game)
+    client.close()
+    return games
+
+
+def run(args) -> Dict:
+    server = None
+    url = args.url
+    if url is None:
+        url = f'http://127.0.0.1:{args.port}'
+        server = start_server(args)
+
+    try:
+        teams = wait_for_server(url, args.startup_timeout, server)
+        stats = {role: Stats() for role in ('create', 'robot', 'spectator', 'referee')}
+        games = create_games(url, teams, args.games, stats['create'])
+
+        ages: List[float] = []
+        started = time.time()
+        until = started + args.duration
+        clients = []
+        for game in games:
+            clients += [gevent.spawn(robot, url, game, args.robot_rate, until, stats['robot'], ages) for _ in range(2)]
+            clients += [
+                gevent.spawn(spectator, url, game, args.spectator_rate, until, stats['spectator'])
+                for _ in range(args.spectators)
+            ]
+            clients.append(gevent.spawn(referee, url, game, args.referee_interval, until, stats['referee']))
+        gevent.joinall(clients)
+        duration = time.time() - started
+
+        return {
+            'params': {
+                'games': args.games, 'duration': args.duration, 'robot_rate': args.robot_rate,
+                'spectators': args.spectators, 'spectator_rate': args.spectator_rate,
+                'referee_interval': args.referee_interval, 'source': 'replay' if args.replay else 'synthetic',
+                'fps': args.fps, 'robots': args.robots, 'objects': args.objects,
+            },
+            'games_created': len(games),
+            'duration': duration,
+            'roles': {role: role_stats.summary(duration) for role, role_stats in stats.items()},
+            'frame_age': {
+                'p50': percentile(ages, 50),
+                'p99': percentile(ages, 99),
+                'stale_rate': sum(1 for age in ages if age > args.stale_after) / len(ages) if ages else None,
+            },
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+def report(results: Dict, stale_after: float):
+    def ms(seconds):
+        return f'{seconds * 1e3:9.2f} ms' if seconds is not None else f'{"-":>12}'
+
+    print(f'{results["games_created"]} games for {results["duration"]:.1f} s')
+    print(f'  {"role":<10} {"requests":>9} {"ok/s":>9} {"p50":>12} {"p99":>12} {"errors":>8}')
+    for role, summary in results['roles'].items():
+        print(
+            f'  {role:<10} {summary["requests"]:>9} {summary["throughput"]:>9.1f} {ms(summary["p50"])} '
+            f'{ms(summary["p99"])} {summary["error_rate"]:>8.2%}'
+        )
+    age = results['frame_age']
+    stale = f'{age["stale_rate"]:.2%}' if age['stale_rate'] is not None else '-'
+    print(f'  frame age seen by robots: p50 {ms(age["p50"])}, p99 {ms(age["p99"])}, '
+          f'older than {stale_after * 1e3:.0f} ms: {stale}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Competition day load test')
+    parser.add_argument('--game', default='beach', help='game the server runs')
+    parser.add_argument('--games', type=int, default=10, help='number of parallel games')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--robot-rate', type=float, default=10, help='requests per second of every robot')
+    parser.add_argument('--spectators', type=int, default=2, help='spectators per game')
+    parser.add_argument('--spectator-rate', type=float, default=1, help='requests per second of every spectator')
+    parser.add_argument('--referee-interval', type=float, default=5, help='seconds between referee calls')
+    parser.add_argument('--stale-after', type=float, default=0.1, help='frame age in seconds counted as stale')
+    parser.add_argument('--url', help='load a server that is already running instead of starting one')
+    parser.add_argument('--port', type=int, default=8089, help='port of the started server')
+    parser.add_argument('--workers', type=int, default=0, help='API worker processes of the started server')
+    parser.add_argument('--shards', type=int, default=0, help='Game shard processes of the started server')
+    parser.add_argument('--replay', help='replay this frame log instead of the synthetic tracker')
+    parser.add_argument('--replay-speed', type=float, default=1.0)
+    parser.add_argument('--fps', type=float, default=30, help='synthetic frames per second')
+    parser.add_argument('--robots', type=int, help='synthetic robots')
+    parser.add_argument('--objects', type=int, help='synthetic objects of every type')
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    parser.add_argument('--server-log', help='write output of the started server to this file')
+    parser.add_argument('--output', help='save results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report(results, args.stale_after)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
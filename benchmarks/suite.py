@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the code that runs on every frame, on synthetic frames of configurable size.
+
+Results are printed and can be saved as JSON and compared with a saved baseline, so regressions between commits show
+up automatically. Run from the repository root:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json --threshold 0.2
+
+The exit code is 1 when a benchmark got slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import measure, report
+from src.classes.GameTypeRegistry import GameTypeRegistry
+from src.classes.StateLiveData import StateLiveData
+from src.classes.SyntheticTracker import SyntheticTracker
+from src.games.beach.Beach import Beach
+from src.games.mine.Mine import Mine
+from src.restapi.GameApi import create_api
+from src.servers.StateServer import StateServer
+from src.utils import check_if_object_in_area, read_config
+
+FORMAT_VERSION = 1
+
+
+def load_config(game_name: str) -> dict:
+    config = read_config(f'./src/games/{game_name}/game_config.yaml')
+    config['log_level'] = 'WARNING'
+    return config
+
+
+def make_frames(config: dict, robots: int, objects: int, frames: int, seed: int) -> list:
+    """
+    Adds synthetic markers to the config and returns frames with all of them
+    """
+    tracker = SyntheticTracker(robots=robots, objects=objects, seed=seed)
+    tracker.prepare(config)
+    generator = tracker.frames()
+    return [next(generator) for _ in range(frames)]
+
+
+def make_game(game_class, config: dict, frames: list):
+    """
+    Returns a running game ticked with the first frame and a function that feeds it the next frame
+    """
+    state_server = StateServer(None, config)
+    game = game_class(state_server, config, list(config['robots'])[:2])
+    game.game_time = 1e9
+    game.start_game()
+
+    position = [0]
+
+    def next_frame():
+        state_server.process(frames[position[0] % len(frames)])
+        position[0] += 1
+
+    next_frame()
+    game.tick(state_server.state)
+    return game, next_frame
+
+
+def state_benchmarks(config: dict, frames: list) -> Dict[str, Tuple[Callable, int]]:
+    state = StateLiveData(config)
+    for frame in frames:
+        state.parse(frame)
+    state.compute_zones()
+    state.compute_motion(0.0)
+
+    def parse():
+        for frame in frames:
+            state.parse(frame)
+
+    def compute_zones():
+        state.compute_zones()
+
+    tick = [0]
+
+    def compute_motion():
+        tick[0] += 1
+        state.compute_motion(tick[0] / 30)
+
+    def history_query():
+        state.history.query(since=tick[0] / 30 - 1)
+
+    markers = list(frames[0].objects.values())
+    fields = list(frames[0].fields.values())
+
+    def check_areas():
+        for marker in markers:
+            for field in fields:
+                check_if_object_in_area(marker.position, field)
+
+    return {
+        'state.parse': (parse, len(frames)),
+        'state.compute_zones': (compute_zones, 1),
+        'state.compute_motion': (compute_motion, 1),
+        'state.history_query': (history_query, 1),
+        'utils.check_if_object_in_area': (check_areas, len(markers) * len(fields)),
+    }
+
+
+def beach_benchmarks(config: dict, frames: list) -> Dict[str, Tuple[Callable, int]]:
+    game, _ = make_game(Beach, config, frames)
+
+    def to_json_bytes():
+        game.publish_frame()
+        game.to_json_bytes()
+
+    # Requests hit the API the same way the WSGI server calls it, without the network
+    client = create_api(SimpleNamespace(
+        game_servers={game.id: game}, game_types=GameTypeRegistry(['beach']), game_config=config, snapshots=None
+    )).test_client()
+
+    def game_response():
+        game.publish_frame()
+        client.get(f'/game/{game.id}')
+
+    def cached_response():
+        client.get(f'/game/{game.id}')
+
+    def extrapolated_response():
+        client.get(f'/game/{game.id}?extrapolate=true')
+
+    return {
+        'beach.check_robots': (game.check_robots, 1),
+        'beach.compute_score': (game.compute_score, 1),
+        'beach.to_json': (game.to_json, 1),
+        'beach.to_json_bytes': (to_json_bytes, 1),
+        'flask.game_response': (game_response, 1),
+        'flask.game_response_cached': (cached_response, 1),
+        'flask.game_response_extrapolated': (extrapolated_response, 1),
+    }
+
+
+def mine_benchmarks(config: dict, frames: list) -> Dict[str, Tuple[Callable, int]]:
+    game, next_frame = make_game(Mine, config, frames)
+
+    def tick():
+        next_frame()
+        game.tick(game.state_server.state)
+
+    return {
+        'mine.compute_score': (game.compute_score, 1),
+        'mine.tick': (tick, 1),
+    }
+
+
+def run(args) -> Dict[str, float]:
+    beach_config = load_config('beach')
+    beach_frames = make_frames(beach_config, args.robots, args.objects, args.frames, args.seed)
+    mine_config = load_config('mine')
+    mine_frames = make_frames(mine_config, args.robots, args.objects, args.frames, args.seed)
+
+    benchmarks = {}
+    benchmarks.update(state_benchmarks(beach_config, beach_frames))
+    benchmarks.update(beach_benchmarks(beach_config, beach_frames))
+    benchmarks.update(mine_benchmarks(mine_config, mine_frames))
+
+    results = {}
+    for name, (func, calls) in benchmarks.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        results[name] = measure(func, args.repeat) / calls
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, float], baseline: Dict, threshold: float) -> List[str]:
+    """
+    Prints results next to the baseline and returns names of benchmarks that regressed by more than threshold
+    """
+    if baseline['params'] != results['params']:
+        print(f'Warning: baseline was measured with {baseline["params"]}')
+
+    regressions = []
+    print(f'{"":<40} {"baseline":>12} {"current":>12} {"change":>8}')
+    for name, seconds in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f'  {name:<38} {"-":>12} {seconds * 1e6:9.2f} us')
+            continue
+        change = seconds / before - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'  {name:<38} {before * 1e6:9.2f} us {seconds * 1e6:9.2f} us {change:+8.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-frame hot path micro-benchmarks')
+    parser.add_argument('--robots', type=int, default=8, help='robots per frame')
+    parser.add_argument('--objects', type=int, default=10, help='objects of every type per frame')
+    parser.add_argument('--frames', type=int, default=10, help='distinct frames to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs, the best one is reported')
+    parser.add_argument('--only', nargs='*', help='run only benchmarks whose name starts with one of these')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--compare', help='compare with results saved by --output')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    params = {'robots': args.robots, 'objects': args.objects, 'frames': args.frames, 'seed': args.seed}
+    results = {
+        'version': FORMAT_VERSION,
+        'commit': git_commit(),
+        'time': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+        # Seconds per call
+        'results': run(args),
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    else:
+        report(f'{args.robots} robots, {args.objects} objects of every type (per call)', list(results['results'].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,10 @@ import getopt
 import sys
 
 from sledilnik.TrackerSetup import TrackerSetup
+from src.classes.FrameLog import FrameReplay
+from src.classes.SyntheticTracker import SyntheticTracker
 from src.restapi.GameApi import GameApi
+from src.utils import read_config
 
 
 def main(argv):
@@ -11,6 +14,15 @@ def main(argv):
     game_name = None
     setup = False
     create_test_game = False
+    record_path = None
+    replay_path = None
+    replay_speed = 1.0
+    source = 'camera'
+    synthetic = {}
+    port = 8088
+    trace_path = None
+    workers = 0
+    shards = 0
 
     try:
         opts, args = getopt.getopt(
@@ -21,7 +33,18 @@ def main(argv):
                 "tracker-config=",
                 "setup",
                 "game=",
-                "test"
+                "test",
+                "record=",
+                "replay=",
+                "replay-speed=",
+                "source=",
+                "fps=",
+                "robots=",
+                "objects=",
+                "port=",
+                "trace=",
+                "workers=",
+                "shards="
             ]
         )
     except getopt.GetoptError:
@@ -43,14 +66,49 @@ def main(argv):
         elif opt in ("-d", "--test"):
             print('Creating a game with id "test"')
             create_test_game = True
+        elif opt == "--record":
+            print(f'Recording tracker frames to: {arg}')
+            record_path = arg
+        elif opt == "--replay":
+            print(f'Replaying tracker frames from: {arg}')
+            replay_path = arg
+        elif opt == "--replay-speed":
+            replay_speed = float(arg)
+        elif opt == "--source":
+            if arg not in ('camera', 'synthetic'):
+                help_text()
+                sys.exit(1)
+            print(f'Tracker source: {arg}')
+            source = arg
+        elif opt == "--fps":
+            synthetic['fps'] = float(arg)
+        elif opt == "--robots":
+            synthetic['robots'] = int(arg)
+        elif opt == "--objects":
+            synthetic['objects'] = int(arg)
+        elif opt == "--port":
+            port = int(arg)
+        elif opt == "--trace":
+            print(f'Writing frame traces to: {arg}')
+            trace_path = arg
+        elif opt == "--workers":
+            workers = int(arg)
+        elif opt == "--shards":
+            shards = int(arg)
 
     if game_name is None:
         raise Exception("Game name not specified.")
 
     if setup:
-        TrackerSetup(tracker_config_path, f'./src/games/{game_name.lower()}/game_config.yaml').start()
+        TrackerSetup(tracker_config_path, f'./src/games/{game_name.split(",")[0].lower()}/game_config.yaml').start()
     else:
-        game_api = GameApi(game_name)
+        tracker = None
+        if replay_path is not None:
+            tracker = FrameReplay(replay_path, replay_speed)
+        elif source == 'synthetic':
+            game_config = read_config(f'./src/games/{game_name.split(",")[0].lower()}/game_config.yaml')
+            tracker = SyntheticTracker.from_config(game_config, **synthetic)
+        game_api = GameApi(game_name, tracker, record_path, port, trace_path, workers, shards)
         if create_test_game:
             game_api.start_test_game_server()
         game_api.start()
@@ -61,8 +119,19 @@ def help_text():
     print("\t--help (-h)                                     shows this help")
     print("\t--tracker-config (-t) <path to tracker config>  sets path to tracker config")
     print("\t--setup (-s)                                    runs tracker setup")
-    print("\t--game (-n) <game name>                         runs game server for given game")
+    print("\t--game (-n) <game name>[,<game name>...]        runs game server for given games, first is the default")
     print("\t--test (-d)                                     creates a test game with longer game time")
+    print("\t--record <path>                                 records tracker frames to a frame log")
+    print("\t--replay <path>                                 replays a frame log instead of running the tracker")
+    print("\t--replay-speed <speed>                          replay speed, 1 is real time, 0 as fast as possible")
+    print("\t--source <camera|synthetic>                     tracker source, synthetic generates frames without a camera")
+    print("\t--fps <fps>                                     synthetic frames per second")
+    print("\t--robots <count>                                number of synthetic robots")
+    print("\t--objects <count>                               number of synthetic objects of every type")
+    print("\t--port <port>                                   port of the REST API, 8088 by default")
+    print("\t--trace <path>                                  writes per-frame stage timings to a Chrome trace file")
+    print("\t--workers <count>                               serves game states from this many API worker processes")
+    print("\t--shards <count>                                updates games in this many processes per arena")
 
 
 if __name__ == '__main__':
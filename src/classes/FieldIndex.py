@@ -0,0 +1,80 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry.polygon import Polygon as SPolygon
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.Point import Point
+
+
+class FieldIndex:
+    """Prepared polygons of the game fields
+
+    Every field polygon is built and prepared once and only rebuilt when the corners of the field change. Points are
+    tested against all fields in a single vectorized call.
+
+    Attributes:
+        names (List[str]): Field names in the column order of the membership matrix
+        columns (Dict[str, int]): Column of each field in the membership matrix
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.columns: Dict[str, int] = {}
+        self._corners: Dict[str, Tuple] = {}
+        self._polygons: Dict[str, SPolygon] = {}
+        self._geometries = np.empty((0, 1), dtype=object)
+
+    def update(self, fields: Dict[str, Field]):
+        """
+        Rebuilds polygons of fields that were added or moved and drops removed fields
+        :param fields: fields by name
+        """
+        changed = False
+
+        for name in list(self._polygons):
+            if name not in fields:
+                del self._polygons[name]
+                del self._corners[name]
+                changed = True
+
+        for name, field in fields.items():
+            corners = field.to_tuple()
+            if self._corners.get(name) != corners:
+                (topLeft, topRight, bottomRight, bottomLeft) = corners
+                polygon = SPolygon((bottomLeft, topLeft, topRight, bottomRight))
+                shapely.prepare(polygon)
+
+                self._polygons[name] = polygon
+                self._corners[name] = corners
+                changed = True
+
+        if changed:
+            self.names = list(self._polygons)
+            self.columns = {name: column for column, name in enumerate(self.names)}
+            self._geometries = np.array([self._polygons[name] for name in self.names], dtype=object).reshape(-1, 1)
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        Checks which points lie in which fields.
+        :param points: array of shape (N, 2) with x and y coordinates
+        :return: boolean matrix of shape (N, M), True where point i lies in field names[j]
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0 or len(self.names) == 0:
+            return np.zeros((len(points), len(self.names)), dtype=bool)
+
+        return shapely.contains_xy(self._geometries, points[:, 0], points[:, 1]).T
+
+    def contains_point(self, point: Point, name: str) -> bool:
+        """
+        Checks if a single point lies in the named field.
+        :param point: point object defining the object position
+        :param name: field name
+        :return: True if point in field
+        """
+        if name not in self._polygons:
+            return False
+        (x, y) = point.to_tuple()
+        return bool(shapely.contains_xy(self._polygons[name], x, y))
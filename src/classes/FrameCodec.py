@@ -0,0 +1,81 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.ObjectTracker import ObjectTracker
+from sledilnik.classes.Point import Point
+from sledilnik.classes.TrackerLiveData import TrackerLiveData
+
+# Fixed layout records of tracked objects and fields, shared by the frame transports and the frame log
+OBJECT_DTYPE = np.dtype([('id', np.int32), ('x', np.float64), ('y', np.float64), ('direction', np.float64)])
+FIELD_DTYPE = np.dtype([('present', np.bool_), ('corners', np.float64, (8,))])
+
+
+def encode_timestamp(timestamp) -> float:
+    """
+    Converts a frame timestamp to seconds since the epoch, NaN if missing
+    """
+    if timestamp is None:
+        return np.nan
+    if hasattr(timestamp, 'timestamp'):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def encode_objects(objects: Dict[int, ObjectTracker]) -> List[Tuple]:
+    """
+    Returns object records that can be assigned to an OBJECT_DTYPE array
+    """
+    return [(key, *obj.position.to_tuple(), obj.direction) for key, obj in objects.items()]
+
+
+def decode_objects(records: np.ndarray) -> Dict[int, ObjectTracker]:
+    return {
+        oid: ObjectTracker(oid, Point(x, y), direction)
+        for oid, x, y, direction in records.tolist()
+    }
+
+
+def encode_fields(fields: Dict[str, Field], field_names: List[str], out: np.ndarray):
+    """
+    Writes corners of the named fields into a FIELD_DTYPE array
+    """
+    for column, name in enumerate(field_names):
+        field = fields.get(name)
+        out['present'][column] = field is not None
+        if field is not None:
+            out['corners'][column] = [c for corner in field.to_tuple() for c in corner]
+
+
+class FieldDecoder:
+    """Decodes field records, reusing Field objects while their corners stay the same"""
+
+    def __init__(self, field_names: List[str]):
+        self.field_names: List[str] = list(field_names)
+        self._fields: Dict[str, Tuple[Tuple, Field]] = {}
+
+    def decode(self, records: np.ndarray) -> Dict[str, Field]:
+        fields = {}
+        present = records['present'].tolist()
+        corners = records['corners'].tolist()
+        for column, name in enumerate(self.field_names):
+            if not present[column]:
+                continue
+
+            key = tuple(corners[column])
+            cached = self._fields.get(name)
+            if cached is None or cached[0] != key:
+                (tlx, tly, trx, try_, brx, bry, blx, bly) = key
+                cached = (key, Field(Point(tlx, tly), Point(trx, try_), Point(brx, bry), Point(blx, bly)))
+                self._fields[name] = cached
+            fields[name] = cached[1]
+        return fields
+
+
+def make_frame(timestamp: float, objects: Dict[int, ObjectTracker], fields: Dict[str, Field]) -> TrackerLiveData:
+    data = TrackerLiveData()
+    data.timestamp = timestamp
+    data.objects = objects
+    data.fields = fields
+    return data
@@ -0,0 +1,222 @@
+import json
+import os
+import struct
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from sledilnik.classes.TrackerLiveData import TrackerLiveData
+from src.classes.FrameCodec import OBJECT_DTYPE, FIELD_DTYPE, FieldDecoder, decode_objects, encode_fields, \
+    encode_objects, encode_timestamp, make_frame
+from src.classes.TrackerSource import TrackerSource
+
+MAGIC = b'RLFRAME1'
+RECORD_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('received', np.float64),
+    ('n_objects', np.uint32),
+    ('has_fields', np.uint32),
+])
+INDEX_DTYPE = np.dtype([
+    ('offset', np.uint64),
+    ('fields_offset', np.uint64),
+    ('timestamp', np.float64),
+])
+
+
+def index_path(path: str) -> str:
+    return path + '.idx'
+
+
+class FrameRecorder:
+    """Append-only binary log of tracker frames
+
+    The log starts with a header naming the recorded fields, followed by one record per frame: timestamps, object
+    records and, only when they changed, the field corners. A separate index file holds the offset and timestamp of
+    every record, so the log can be memory-mapped and seeked.
+
+    Attributes:
+        frames (int): Number of frames recorded
+    """
+
+    def __init__(self, path: str, field_names: List[str], flush_every: int = 30):
+        self.path = path
+        self.field_names: List[str] = list(field_names)
+        self.flush_every = flush_every
+        self.frames: int = 0
+
+        self._log = open(path, 'wb')
+        self._index = open(index_path(path), 'wb')
+
+        header = json.dumps({'fields_names': self.field_names}).encode('utf-8')
+        self._log.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self._offset = self._log.tell()
+
+        self._fields = np.zeros(len(self.field_names), dtype=FIELD_DTYPE)
+        self._fields_offset = 0
+
+    def record(self, data: TrackerLiveData, received: float):
+        """
+        Appends a frame
+        :param data: frame from the tracker
+        :param received: time the server received the frame, seconds since the epoch
+        """
+        fields = np.zeros(len(self.field_names), dtype=FIELD_DTYPE)
+        encode_fields(data.fields, self.field_names, fields)
+        has_fields = self.frames == 0 or fields.tobytes() != self._fields.tobytes()
+
+        objects = np.array(encode_objects(data.objects), dtype=OBJECT_DTYPE)
+        header = np.array(
+            [(encode_timestamp(data.timestamp), received, len(objects), has_fields)],
+            dtype=RECORD_DTYPE
+        )
+
+        offset = self._offset
+        if has_fields:
+            self._fields = fields
+            self._fields_offset = offset + header.nbytes + objects.nbytes
+
+        self._log.write(header.tobytes())
+        self._log.write(objects.tobytes())
+        if has_fields:
+            self._log.write(fields.tobytes())
+        self._offset = self._log.tell()
+
+        entry = np.array([(offset, self._fields_offset, header['timestamp'][0])], dtype=INDEX_DTYPE)
+        self._index.write(entry.tobytes())
+
+        self.frames += 1
+        if self.frames % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        # Log before index, so every index entry points to a complete record
+        self._log.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._log.close()
+        self._index.close()
+
+
+class FrameLog:
+    """Memory-mapped reader of a frame log written by FrameRecorder
+
+    Attributes:
+        field_names (List[str]): Recorded fields
+        index (np.ndarray): Offset and timestamp of every frame
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._log = np.memmap(path, dtype=np.uint8, mode='r')
+
+        if self._log[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f'{path} is not a frame log')
+        (header_length,) = struct.unpack('<I', self._log[len(MAGIC):len(MAGIC) + 4].tobytes())
+        header = json.loads(self._log[len(MAGIC) + 4:len(MAGIC) + 4 + header_length].tobytes())
+        self.field_names: List[str] = header['fields_names']
+
+        self._field_decoder = FieldDecoder(self.field_names)
+
+        # Ignore index entries of records that do not fit in the log, they were not flushed completely yet
+        if os.path.getsize(index_path(path)) >= INDEX_DTYPE.itemsize:
+            index = np.memmap(index_path(path), dtype=INDEX_DTYPE, mode='r')
+        else:
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.index = index[self._record_ends(index) <= len(self._log)]
+
+    def _record_ends(self, index: np.ndarray) -> np.ndarray:
+        """
+        Returns the offset after every record of the index. Records are written back to back, so each one ends where
+        the next one starts, the length of the last one is read from its header.
+        """
+        ends = np.zeros(len(index), dtype=np.uint64)
+        if len(index) == 0:
+            return ends
+        ends[:-1] = index['offset'][1:]
+
+        offset = int(index['offset'][-1])
+        end = offset + RECORD_DTYPE.itemsize
+        if end <= len(self._log):
+            header = np.frombuffer(self._log, dtype=RECORD_DTYPE, count=1, offset=offset)[0]
+            end += int(header['n_objects']) * OBJECT_DTYPE.itemsize
+            if header['has_fields']:
+                end += len(self.field_names) * FIELD_DTYPE.itemsize
+        ends[-1] = end
+        return ends
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def seek(self, timestamp: float) -> int:
+        """
+        Returns the position of the first frame captured at or after timestamp
+        """
+        return int(np.searchsorted(self.index['timestamp'], timestamp))
+
+    def read(self, position: int) -> TrackerLiveData:
+        offset, fields_offset, _ = self.index[position].tolist()
+
+        header = np.frombuffer(self._log, dtype=RECORD_DTYPE, count=1, offset=offset)[0]
+        objects = np.frombuffer(
+            self._log, dtype=OBJECT_DTYPE, count=int(header['n_objects']), offset=offset + RECORD_DTYPE.itemsize
+        )
+        fields = np.frombuffer(self._log, dtype=FIELD_DTYPE, count=len(self.field_names), offset=fields_offset)
+
+        return make_frame(float(header['timestamp']), decode_objects(objects), self._field_decoder.decode(fields))
+
+    def received(self, position: int) -> float:
+        offset = int(self.index['offset'][position])
+        return float(np.frombuffer(self._log, dtype=RECORD_DTYPE, count=1, offset=offset)['received'][0])
+
+
+class FrameReplay(TrackerSource):
+    """Tracker that plays a frame log back
+
+    Tracker source used in place of sledilnik's TrackerGame: start runs in the tracker process and puts frames into
+    the queue, keeping the recorded pace scaled by speed. Frames are stamped with the time they are replayed. At the
+    end of the log the process stays alive without sending frames, unless loop is set.
+
+    Attributes:
+        speed (float): Replay speed, 1 is real time, 0 replays as fast as possible
+        loop (bool): Start over at the end of the log
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False, start: Optional[float] = None):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.start_timestamp = start
+
+    def start(self, queue):
+        frame_log = FrameLog(self.path)
+        first = frame_log.seek(self.start_timestamp) if self.start_timestamp is not None else 0
+
+        # An empty log, or a start past its end, has nothing to loop over
+        while first < len(frame_log):
+            started = time.time()
+            for position in range(first, len(frame_log)):
+                if self.speed > 0:
+                    delay = (self._recorded_time(frame_log, position) - self._recorded_time(frame_log, first)) \
+                        / self.speed - (time.time() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                data = frame_log.read(position)
+                data.timestamp = time.time()
+                queue.put(data)
+
+            if not self.loop:
+                break
+
+        # Stay alive with the last frame, TrackerServer restarts trackers that exit
+        while True:
+            time.sleep(3600)
+
+    @staticmethod
+    def _recorded_time(frame_log: FrameLog, position: int) -> float:
+        timestamp = float(frame_log.index['timestamp'][position])
+        return timestamp if not np.isnan(timestamp) else frame_log.received(position)
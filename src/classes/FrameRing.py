@@ -0,0 +1,149 @@
+from multiprocessing import Event, shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from sledilnik.classes.TrackerLiveData import TrackerLiveData
+from src.classes.FrameCodec import OBJECT_DTYPE, FIELD_DTYPE, FieldDecoder, decode_objects, encode_fields, \
+    encode_objects, encode_timestamp, make_frame
+from src.utils import attach_shared_memory, unlink_shared_memory
+
+# Header is padded to a cache line so the slots do not share one with the head counter
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('head', np.uint64), ('truncated', np.uint64)])
+
+
+class FrameRing:
+    """Ring buffer of tracker frames in shared memory
+
+    The tracker process writes frames with put(), the same way it would put them in a multiprocessing.Queue, and the
+    server reads them straight from shared memory without pickling. Every slot holds one frame with a fixed layout:
+    sequence number, timestamp, up to max_objects (id, x, y, direction) records and the corners of the configured
+    fields.
+
+    The slot sequence number is cleared while a slot is written and set when the frame is complete, so a reader can
+    detect slots that are being written or were overwritten while it was reading.
+
+    Attributes:
+        field_names (List[str]): Fields stored in every frame, in slot order
+        slots (int): Number of frames kept
+        max_objects (int): Maximum number of objects per frame, extra objects are dropped
+        written (Event): Set by the writer after every frame, lets the reader block instead of polling
+    """
+
+    def __init__(self, field_names: List[str], slots: int = 8, max_objects: int = 64, name: Optional[str] = None,
+                 written=None):
+        self.field_names: List[str] = list(field_names)
+        self.slots: int = slots
+        self.max_objects: int = max_objects
+        self.written = written if written is not None else Event()
+
+        self._slot_dtype = np.dtype([
+            ('seq', np.uint64),
+            ('timestamp', np.float64),
+            ('n_objects', np.uint32),
+            ('objects', OBJECT_DTYPE, (max_objects,)),
+            ('fields', FIELD_DTYPE, (len(self.field_names),)),
+        ])
+
+        self.owner: bool = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + slots * self._slot_dtype.itemsize)
+        else:
+            # The owner unlinks the segment
+            self.shm = attach_shared_memory(name)
+
+        self.header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf, offset=0)
+        self.ring = np.ndarray((slots,), dtype=self._slot_dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+
+        self._field_decoder = FieldDecoder(self.field_names)
+
+    def __getstate__(self):
+        return {
+            'field_names': self.field_names,
+            'slots': self.slots,
+            'max_objects': self.max_objects,
+            'name': self.shm.name,
+            'written': self.written
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['field_names'], state['slots'], state['max_objects'], state['name'], state['written'])
+
+    @property
+    def truncated(self) -> int:
+        """
+        Returns the number of frames written with more than max_objects objects, counted in the shared header so the
+        reader sees the count of the writer
+        """
+        return int(self.header['truncated'][0])
+
+    def head(self) -> int:
+        """
+        Returns the sequence number of the newest complete frame, 0 if nothing was written yet
+        """
+        return int(self.header['head'][0])
+
+    def put(self, data: TrackerLiveData, block=True, timeout=None):
+        """
+        Writes a frame into the next slot. Never blocks, the oldest frame is overwritten.
+        """
+        seq = self.head() + 1
+        index = seq % self.slots
+
+        # Mark slot as being written
+        self.ring['seq'][index] = 0
+
+        self.ring['timestamp'][index] = encode_timestamp(data.timestamp)
+
+        rows = encode_objects(data.objects)
+        if len(rows) > self.max_objects:
+            rows = rows[:self.max_objects]
+            self.header['truncated'][0] += 1
+        self.ring['objects'][index][:len(rows)] = rows
+        self.ring['n_objects'][index] = len(rows)
+
+        encode_fields(data.fields, self.field_names, self.ring['fields'][index])
+
+        self.ring['seq'][index] = seq
+        self.header['head'][0] = seq
+        self.written.set()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Blocks the calling thread until the writer puts a frame
+        :param timeout: maximum number of seconds to wait
+        :return: True if a frame may have been written
+        """
+        if not self.written.wait(timeout):
+            return False
+        # Clear before the caller reads the head, so a frame written after that sets the event again
+        self.written.clear()
+        return True
+
+    def read(self, seq: int) -> Optional[TrackerLiveData]:
+        """
+        Decodes a frame
+        :param seq: sequence number of the frame
+        :return: frame or None if the slot does not hold it (anymore) or was overwritten while reading
+        """
+        index = seq % self.slots
+        if self.ring['seq'][index] != seq:
+            return None
+
+        data = make_frame(
+            float(self.ring['timestamp'][index]),
+            decode_objects(self.ring['objects'][index][:self.ring['n_objects'][index]]),
+            self._field_decoder.decode(self.ring['fields'][index])
+        )
+
+        if self.ring['seq'][index] != seq:
+            return None
+        return data
+
+    def close(self):
+        self.header = None
+        self.ring = None
+        self.shm.close()
+        if self.owner:
+            unlink_shared_memory(self.shm)
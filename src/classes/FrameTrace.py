@@ -0,0 +1,100 @@
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FrameTrace:
+    """Stage timestamps of one tracker frame
+
+    Created when the frame is received from the tracker and passed along with it, each stage adds a span when it is
+    done with the frame. All times are seconds since the epoch, so they compare with the tracker capture time.
+
+    Attributes:
+        seq (int): Frame number
+        captured (float): Time the tracker captured the frame, NaN if the tracker did not stamp it
+        received (float): Time the tracker server received the frame
+        spans (List[Tuple]): (name, track, start, end, args) of every stage done with the frame
+    """
+
+    __slots__ = ('seq', 'captured', 'received', 'spans')
+
+    def __init__(self, seq: int, captured: float, received: float):
+        self.seq: int = seq
+        self.captured: float = captured
+        self.received: float = received
+        self.spans: List[Tuple[str, str, float, float, Optional[Dict]]] = []
+
+    def span(self, name: str, track: str, start: float, end: float, args: Optional[Dict] = None):
+        self.spans.append((name, track, start, end, args))
+
+    def origin(self) -> float:
+        """
+        Returns the time the frame was captured, or received if the capture time is unknown
+        """
+        return self.captured if not math.isnan(self.captured) else self.received
+
+    def age(self, now: Optional[float] = None) -> float:
+        """
+        Returns seconds since the frame was captured, or received if the capture time is unknown
+        """
+        now = time.time() if now is None else now
+        return now - self.origin()
+
+
+class TraceRecorder:
+    """Writes frame traces to a Chrome trace file
+
+    Events are written in the JSON array format without the closing bracket, which chrome://tracing and Perfetto
+    accept, so the file stays readable when the server is killed. Every stage is a track of the same process.
+
+    Attributes:
+        frames (int): Number of frames written
+    """
+
+    def __init__(self, path: str, flush_every: int = 30):
+        self.path = path
+        self.flush_every = flush_every
+        self.frames: int = 0
+
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[\n')
+        self._pid = os.getpid()
+        self._tracks: Dict[str, int] = {}
+
+    def _track(self, name: str) -> int:
+        tid = self._tracks.get(name)
+        if tid is None:
+            tid = self._tracks[name] = len(self._tracks) + 1
+            self._write({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}})
+        return tid
+
+    def _write(self, event: Dict):
+        self._file.write(json.dumps(event, separators=(',', ':')) + ',\n')
+
+    def _complete(self, name: str, track: str, start: float, end: float, args: Dict):
+        self._write({
+            'name': name,
+            'ph': 'X',
+            'ts': start * 1e6,
+            'dur': max(end - start, 0) * 1e6,
+            'pid': self._pid,
+            'tid': self._track(track),
+            'args': args
+        })
+
+    def record(self, trace: FrameTrace):
+        frame = {'frame': trace.seq}
+        if not math.isnan(trace.captured):
+            self._complete('tracker to server', 'tracker', trace.captured, trace.received, frame)
+        for name, track, start, end, args in trace.spans:
+            self._complete(name, track, start, end, dict(frame, **args) if args else frame)
+
+        self.frames += 1
+        if self.frames % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
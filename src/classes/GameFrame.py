@@ -0,0 +1,43 @@
+from typing import Dict, Optional
+
+from src.classes.StateLiveData import StateLiveData
+
+
+class GameFrame:
+    """Published state of a game at one frame
+
+    Built by the game server after every tick or state change and published by swapping one reference, so readers
+    get the state, scores and timer values of the same moment without locking. Nothing in a frame is changed after
+    it is published, except for the encoded state, which is filled in by the first request.
+
+    Attributes:
+        seq (int): Frame sequence number of the game
+        etag (str): Entity tag of the frame
+        state (StateLiveData): Tracker state the game was computed from
+        game_on (bool): Game is running
+        game_paused (bool): Game is paused
+        time_left (float): Seconds left in the game
+        teams (Dict[str, Dict]): Encodable team states by robot id
+        encoded (bytes): Encoded game state, None until first requested
+    """
+
+    __slots__ = ('seq', 'etag', 'state', 'game_on', 'game_paused', 'time_left', 'teams', 'encoded')
+
+    def __init__(self, seq: int, etag: str, state: StateLiveData, game_on: bool, game_paused: bool,
+                 time_left: float, teams: Dict[str, Dict]):
+        self.seq = seq
+        self.etag = etag
+        self.state = state
+        self.game_on = game_on
+        self.game_paused = game_paused
+        self.time_left = time_left
+        self.teams = teams
+        self.encoded: Optional[bytes] = None
+
+    def age(self) -> Optional[float]:
+        """
+        Returns seconds since the tracker captured the frame, None if it was not traced
+        """
+        if self.state.trace is None:
+            return None
+        return self.state.trace.age()
@@ -0,0 +1,132 @@
+import weakref
+from collections import OrderedDict
+from timeit import default_timer as timer
+from typing import Callable, Dict, Optional
+
+from src.servers.GameServer import GameServer
+
+
+class GameRegistry:
+    """Open games with bounded capacity
+
+    Behaves like a dict of games by id. Games are kept in least recently used order, looking a game up marks it as
+    used. When the registry is full the least recently used game is evicted, preferring games that are not running.
+    Games that were not used for idle_ttl seconds and are not running are expired.
+
+    Attributes:
+        capacity (int): Maximum number of open games
+        idle_ttl (float): Seconds after which an unused game that is not running is expired
+        evicted (int): Number of games evicted or expired so far
+        removed (int): Number of games removed on request so far
+    """
+
+    def __init__(self, capacity: int, idle_ttl: float, release: Callable[[GameServer], None]):
+        self.capacity: int = capacity
+        self.idle_ttl: float = idle_ttl
+        self.release = release
+
+        self._games: 'OrderedDict[str, GameServer]' = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+
+        self.evicted: int = 0
+        self.removed: int = 0
+        # Games that left the registry, used to detect ones that are still running
+        self._released = weakref.WeakSet()
+
+    def __contains__(self, game_id) -> bool:
+        return game_id in self._games
+
+    def __getitem__(self, game_id: str) -> GameServer:
+        game = self._games[game_id]
+        self.touch(game_id)
+        return game
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __iter__(self):
+        return iter(list(self._games))
+
+    def get(self, game_id: str, default=None) -> Optional[GameServer]:
+        if game_id in self._games:
+            return self[game_id]
+        return default
+
+    def keys(self):
+        return list(self._games.keys())
+
+    def values(self):
+        return list(self._games.values())
+
+    def items(self):
+        return list(self._games.items())
+
+    def touch(self, game_id: str):
+        self._games.move_to_end(game_id)
+        self._last_used[game_id] = timer()
+
+    def add(self, game: GameServer):
+        """
+        Adds a game, expiring idle games and evicting one if the registry is full
+        """
+        if game.id in self._games:
+            self.pop(game.id)
+
+        self.expire()
+        while len(self._games) >= self.capacity:
+            self._evict(self._eviction_candidate())
+
+        self._games[game.id] = game
+        self._last_used[game.id] = timer()
+
+    def pop(self, game_id: str) -> GameServer:
+        """
+        Removes a game on request and releases it
+        """
+        game = self._remove(game_id)
+        self.removed += 1
+        return game
+
+    def expire(self):
+        """
+        Evicts games that are not running and were not used for idle_ttl seconds
+        """
+        now = timer()
+        for game_id, game in list(self._games.items()):
+            if not self._running(game) and now - self._last_used[game_id] > self.idle_ttl:
+                self._evict(game_id)
+
+    def _eviction_candidate(self) -> str:
+        # Least recently used first, finished games before running ones
+        for game_id, game in self._games.items():
+            if not self._running(game):
+                return game_id
+        return next(iter(self._games))
+
+    def _evict(self, game_id: str):
+        self._remove(game_id)
+        self.evicted += 1
+
+    def _remove(self, game_id: str) -> GameServer:
+        game = self._games.pop(game_id)
+        del self._last_used[game_id]
+        self.release(game)
+        self._released.add(game)
+        return game
+
+    @staticmethod
+    def _running(game: GameServer) -> bool:
+        return game.game_on and not game.game_paused
+
+    def stats(self) -> Dict:
+        return {
+            'capacity': self.capacity,
+            'idle_ttl': self.idle_ttl,
+            'live': len(self._games),
+            'evicted': self.evicted,
+            'removed': self.removed,
+            # Released games whose greenlet is still running
+            'leaked': sum(1 for game in self._released if game.started and not game.dead),
+            # Released games that are still referenced, e.g. by a waiting request
+            'retained': len(self._released)
+        }
@@ -0,0 +1,140 @@
+import copy
+import importlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+
+from flask_restx import Api
+from flask_restx.model import Model
+
+from src.utils import read_config
+
+
+class GameType(NamedTuple):
+    """Game class with the config it was written for"""
+    # Directory of the game in src/games, lower case
+    name: str
+    game_class: type
+    game_config: dict
+
+    def robots(self) -> Set[int]:
+        return set(self.game_config['robots'])
+
+    def objects(self) -> Set[int]:
+        return {object_id for object_ids in self.game_config['objects'].values() for object_id in object_ids}
+
+
+class PrefixedModels:
+    """Api stand-in that puts a prefix on the names of the models it defines
+
+    to_model of every game class names its models the same, e.g. 'GameServer' and 'Teams', so the models of several
+    classes are defined through this to keep them apart in the Swagger document. Everything else is passed to the api.
+    """
+
+    def __init__(self, api: Api, prefix: str):
+        self.api = api
+        self.prefix = prefix
+
+    def model(self, name: Optional[str] = None, model=None, **kwargs) -> Model:
+        return self.api.model(self.prefix + name if name else name, model, **kwargs)
+
+    def clone(self, name: str, *specs) -> Model:
+        return self.api.clone(self.prefix + name, *specs)
+
+    def inherit(self, name: str, *specs) -> Model:
+        return self.api.inherit(self.prefix + name, *specs)
+
+    def __getattr__(self, attribute):
+        return getattr(self.api, attribute)
+
+
+class GameTypeRegistry:
+    """Game classes this server can run
+
+    A game type is loaded by name from src/games/<name>: the class <Name> from <Name>.py and game_config.yaml. All
+    types share the tracker and state pipeline, whose config is the config of the default type with the robots,
+    objects and fields of the other types added, and each game gets the config of its own type. A marker may be a
+    robot of one type and an object of another, the state then lists it as both and every game only sees its own.
+
+    Attributes:
+        types (Dict[str, GameType]): Game types by name, the first one is the default
+    """
+
+    def __init__(self, names: List[str]):
+        self.types: Dict[str, GameType] = {}
+        for name in names:
+            self.load(name)
+
+    def load(self, name: str) -> GameType:
+        name = name.strip().lower()
+        class_name = name.capitalize()
+        game_class = getattr(importlib.import_module(f'src.games.{name}.{class_name}'), class_name)
+        game_type = GameType(name, game_class, read_config(f'./src/games/{name}/game_config.yaml'))
+        self.types[name] = game_type
+        return game_type
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and name.lower() in self.types
+
+    def __iter__(self) -> Iterator[GameType]:
+        return iter(self.types.values())
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @property
+    def default(self) -> GameType:
+        return next(iter(self.types.values()))
+
+    def get(self, name: Optional[str] = None) -> GameType:
+        """
+        Returns the game type with the given name, the default type if None
+        """
+        if name is None:
+            return self.default
+        return self.types[name.lower()]
+
+    def shared_config(self) -> dict:
+        """
+        Returns the config of the tracker and state pipeline: the default config with the robots, objects and fields of
+        every type. A robot that types name differently carries all their names, games take the names of their own
+        type. dual_markers lists the markers that are robots of one type and objects of another.
+        """
+        config = copy.deepcopy(self.default.game_config)
+        dual_markers = set()
+        names: Dict[int, List[str]] = {}
+        for game_type in self:
+            for robot_id, robot_name in game_type.game_config['robots'].items():
+                robot_names = names.setdefault(robot_id, [])
+                if robot_name not in robot_names:
+                    robot_names.append(robot_name)
+            for object_type, object_ids in game_type.game_config['objects'].items():
+                merged = config['objects'].setdefault(object_type, [])
+                merged.extend(object_id for object_id in object_ids if object_id not in merged)
+            config['fields_names'].extend(
+                field for field in game_type.game_config['fields_names'] if field not in config['fields_names']
+            )
+            for other in self:
+                if other is not game_type:
+                    dual_markers.update(game_type.robots() & other.objects())
+        config['robots'] = {robot_id: ' / '.join(robot_names) for robot_id, robot_names in names.items()}
+        config['dual_markers'] = sorted(dual_markers)
+        return config
+
+    def markers(self) -> Set[int]:
+        """
+        Returns the robot and object markers of all types
+        """
+        return set().union(*(game_type.robots() | game_type.objects() for game_type in self))
+
+    def to_models(self, api: Api) -> Dict[str, Model]:
+        """
+        Defines the Swagger model of the game state of every type
+        :return: models by type name, model names get the class name as prefix when there are several types
+        """
+        if len(self) == 1:
+            return {self.default.name: self.default.game_class.to_model(api, self.default.game_config)}
+        return {
+            game_type.name: game_type.game_class.to_model(
+                PrefixedModels(api, game_type.game_class.__name__), game_type.game_config
+            )
+            for game_type in self
+        }
@@ -0,0 +1,217 @@
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds for request latencies
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds in seconds for work done on every frame
+FRAME_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+class Metric(ABC):
+    """Named metric with children per label values
+
+    Children are created on first use and cached, so hot paths look a child up once and update it without
+    formatting or locking. Values are only formatted when the metrics are scraped.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names: Tuple[str, ...] = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f'{self.name} expects labels {self.label_names}')
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        pass
+
+    def _default(self):
+        return self.labels()
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        pass
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _Value:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value: float = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]):
+        """
+        Reads the value from function when scraped, for values another object already keeps
+        """
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            value = self.function()
+            return float(value) if value is not None else math.nan
+        return self.value
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type = 'counter'
+
+    class Child(_Value):
+        __slots__ = ()
+
+        def inc(self, amount: float = 1):
+            self.value += amount
+
+    def _new_child(self):
+        return Counter.Child()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default().set_function(function)
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.label_names, key)} {_format_value(child.get())}'
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    type = 'gauge'
+
+    class Child(Counter.Child):
+        __slots__ = ()
+
+        def set(self, value: float):
+            self.value = value
+
+        def dec(self, amount: float = 1):
+            self.value -= amount
+
+    def _new_child(self):
+        return Gauge.Child()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class Histogram(Metric):
+    """Counts of observations in fixed buckets, with their sum"""
+
+    type = 'histogram'
+
+    class Child:
+        __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+        def __init__(self, buckets: Tuple[float, ...]):
+            self.buckets = buckets
+            # Last count is for observations above every bucket
+            self.counts: List[int] = [0] * (len(buckets) + 1)
+            self.sum: float = 0.0
+            self.count: int = 0
+
+        def observe(self, value: float):
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        Metric.__init__(self, name, documentation, labels)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return Histogram.Child(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+            lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics exposed on /metrics in the Prometheus text format
+
+    Asking for a metric that is already registered returns the existing one, so modules and servers can declare the
+    metrics they update without coordinating.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get(self, metric_class, name: str, documentation: str, labels: Tuple[str, ...], **kwargs) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_class(name, documentation, labels, **kwargs)
+        elif type(metric) is not metric_class:
+            raise ValueError(f'Metric {name} is already registered as a {metric.type}')
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self) -> bytes:
+        return ('\n'.join(metric.render() for metric in self._metrics.values()) + '\n').encode('utf-8')
+
+
+# Registry of the server process
+METRICS = MetricsRegistry()
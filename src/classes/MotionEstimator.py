@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class MotionFrame:
+    """Velocities of the markers in one frame
+
+    Holds copies of the estimate, so it does not change when the next frame is folded in.
+
+    Attributes:
+        ids (List[int]): Marker ids in the row order of the arrays
+        time (np.ndarray): Time each marker was last seen
+        position (np.ndarray): Last position (x, y)
+        direction (np.ndarray): Last direction in degrees
+        velocity (np.ndarray): Smoothed velocity (x, y) in tracker units per second
+        turn_rate (np.ndarray): Smoothed turn rate in degrees per second
+    """
+
+    __slots__ = ('ids', 'time', 'position', 'direction', 'velocity', 'turn_rate', 'max_horizon', '_json')
+
+    def __init__(self, ids: List[int], time: np.ndarray, position: np.ndarray, direction: np.ndarray,
+                 velocity: np.ndarray, turn_rate: np.ndarray, max_horizon: float):
+        self.ids = ids
+        self.time = time
+        self.position = position
+        self.direction = direction
+        self.velocity = velocity
+        self.turn_rate = turn_rate
+        self.max_horizon = max_horizon
+        self._json: Optional[Dict[int, Dict]] = None
+
+    def extrapolate(self, at: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predicts positions and directions of the markers
+        :param at: time to predict for, seconds since the epoch
+        :return: positions (x, y) and directions in the order of ids, directions in [0, 360) like the tracker's
+        """
+        ahead = np.clip(at - self.time, 0.0, self.max_horizon)
+        return self.position + self.velocity * ahead[:, None], (self.direction + self.turn_rate * ahead) % 360.0
+
+    def to_json(self) -> Dict[int, Dict]:
+        """
+        Returns velocity and turn rate of the markers, encoded once per frame
+        """
+        if self._json is None:
+            self._json = {
+                key: {'x': vx, 'y': vy, 'direction': turn}
+                for key, (vx, vy), turn in zip(self.ids, self.velocity.tolist(), self.turn_rate.tolist())
+            }
+        return self._json
+
+    def extrapolated_json(self, at: float) -> Dict[int, Dict]:
+        """
+        Returns positions and directions of the markers predicted for the given time
+        """
+        position, direction = self.extrapolate(at)
+        return {
+            key: {'x': x, 'y': y, 'direction': turn}
+            for key, (x, y), turn in zip(self.ids, position.tolist(), direction.tolist())
+        }
+
+
+class MotionEstimator:
+    """Velocity and turn rate of tracked markers
+
+    Keeps the last position, direction and a smoothed velocity of every marker in arrays with one row per marker, so
+    a frame is folded in with a few vectorized operations. Velocity is an exponential moving average of the
+    displacement between frames; a marker that was not seen for longer than max_gap starts again at rest.
+
+    Attributes:
+        rows (Dict[int, int]): Row of each marker id
+        time (np.ndarray): Time the marker was last seen, seconds since the epoch
+        position (np.ndarray): Last position (x, y)
+        direction (np.ndarray): Last direction in degrees
+        velocity (np.ndarray): Smoothed velocity (x, y) in tracker units per second
+        turn_rate (np.ndarray): Smoothed turn rate in degrees per second
+    """
+
+    def __init__(self, smoothing: float = 0.5, max_gap: float = 0.5, max_horizon: float = 0.5):
+        """
+        :param smoothing: weight of the newest displacement in the moving average, 1 disables smoothing
+        :param max_gap: seconds after which a marker that was not seen is considered at rest
+        :param max_horizon: maximum number of seconds positions are extrapolated ahead
+        """
+        self.smoothing = smoothing
+        self.max_gap = max_gap
+        self.max_horizon = max_horizon
+
+        self.rows: Dict[int, int] = {}
+        self.time = np.zeros(0)
+        self.position = np.zeros((0, 2))
+        self.direction = np.zeros(0)
+        self.velocity = np.zeros((0, 2))
+        self.turn_rate = np.zeros(0)
+
+    def _add_rows(self, ids: List[int]):
+        for key in ids:
+            self.rows[key] = len(self.rows)
+
+        count = len(ids)
+        self.time = np.concatenate((self.time, np.full(count, -np.inf)))
+        self.position = np.concatenate((self.position, np.zeros((count, 2))))
+        self.direction = np.concatenate((self.direction, np.zeros(count)))
+        self.velocity = np.concatenate((self.velocity, np.zeros((count, 2))))
+        self.turn_rate = np.concatenate((self.turn_rate, np.zeros(count)))
+
+    def update(self, ids: List[int], position: np.ndarray, direction: np.ndarray, timestamp: float) -> MotionFrame:
+        """
+        Folds the markers seen in a frame into the estimate
+        :param ids: ids of the markers in the frame
+        :param position: positions (x, y) of the markers
+        :param direction: directions of the markers in degrees
+        :param timestamp: capture time of the frame, seconds since the epoch
+        :return: estimate of the markers in the frame
+        """
+        new = [key for key in dict.fromkeys(ids) if key not in self.rows]
+        if new:
+            self._add_rows(new)
+
+        rows = np.fromiter((self.rows[key] for key in ids), dtype=np.intp, count=len(ids))
+
+        dt = timestamp - self.time[rows]
+        moving = (dt > 0) & (dt <= self.max_gap)
+        step = np.where(moving, dt, 1.0)
+
+        measured = (position - self.position[rows]) / step[:, None]
+        # Shortest turn between the two directions
+        turned = ((direction - self.direction[rows] + 180.0) % 360.0 - 180.0) / step
+
+        # Moving markers are smoothed, (re)acquired ones start at rest and repeated frames keep the estimate
+        seen = dt > 0
+        velocity = self.velocity[rows]
+        turn_rate = self.turn_rate[rows]
+        self.velocity[rows] = np.where(
+            moving[:, None],
+            velocity + self.smoothing * (measured - velocity),
+            np.where(seen[:, None], 0.0, velocity)
+        )
+        self.turn_rate[rows] = np.where(
+            moving,
+            turn_rate + self.smoothing * (turned - turn_rate),
+            np.where(seen, 0.0, turn_rate)
+        )
+
+        self.time[rows[seen]] = timestamp
+        self.position[rows[seen]] = position[seen]
+        self.direction[rows[seen]] = direction[seen]
+
+        # Indexing with the rows copies the arrays
+        return MotionFrame(
+            ids, self.time[rows], self.position[rows], self.direction[rows], self.velocity[rows], self.turn_rate[rows],
+            self.max_horizon
+        )
@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+HISTORY_COLUMNS = ('timestamp', 'x', 'y', 'direction')
+
+
+class PositionHistory:
+    """Recent positions of tracked markers
+
+    Every marker has a ring buffer of the last length (timestamp, x, y, direction) samples, stored as rows of
+    preallocated arrays, so memory stays bounded by the number of markers and a frame is appended with a few
+    vectorized assignments. Queries return array slices of the rings, which are encoded without building Python
+    objects per sample.
+
+    Attributes:
+        length (int): Number of samples kept per marker
+        rows (Dict[int, int]): Row of each marker id
+        columns (Dict[str, np.ndarray]): Ring buffers of every column, one row per marker
+        head (np.ndarray): Index of the next sample written in each row
+        count (np.ndarray): Number of samples in each row
+    """
+
+    def __init__(self, length: int = 4096):
+        self.length = length
+        self.rows: Dict[int, int] = {}
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros((0, length)) for name in HISTORY_COLUMNS}
+        self.head = np.zeros(0, dtype=np.intp)
+        self.count = np.zeros(0, dtype=np.intp)
+
+    def _add_rows(self, ids: List[int]):
+        for key in ids:
+            self.rows[key] = len(self.rows)
+
+        count = len(ids)
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate((column, np.zeros((count, self.length))))
+        self.head = np.concatenate((self.head, np.zeros(count, dtype=np.intp)))
+        self.count = np.concatenate((self.count, np.zeros(count, dtype=np.intp)))
+
+    def append(self, ids: List[int], position: np.ndarray, direction: np.ndarray, timestamp: float):
+        """
+        Adds the markers seen in a frame
+        :param ids: ids of the markers in the frame
+        :param position: positions (x, y) of the markers
+        :param direction: directions of the markers in degrees
+        :param timestamp: capture time of the frame, seconds since the epoch
+        """
+        new = [key for key in dict.fromkeys(ids) if key not in self.rows]
+        if new:
+            self._add_rows(new)
+        if not ids:
+            return
+
+        rows = np.fromiter((self.rows[key] for key in ids), dtype=np.intp, count=len(ids))
+        head = self.head[rows]
+
+        # Keep every ring sorted by time, repeated frames are not stored again
+        fresh = (self.count[rows] == 0) | (self.columns['timestamp'][rows, head - 1] < timestamp)
+        rows, head = rows[fresh], head[fresh]
+
+        self.columns['timestamp'][rows, head] = timestamp
+        self.columns['x'][rows, head] = position[fresh, 0]
+        self.columns['y'][rows, head] = position[fresh, 1]
+        self.columns['direction'][rows, head] = direction[fresh]
+
+        self.head[rows] = (head + 1) % self.length
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.length)
+
+    def query(self, ids: Optional[Iterable[int]] = None, since: float = -np.inf,
+              until: float = np.inf) -> Dict[int, Dict[str, np.ndarray]]:
+        """
+        Returns the samples of markers captured in a time range, oldest first
+        :param ids: marker ids, all markers if None
+        :param since: start of the range, seconds since the epoch
+        :param until: end of the range, inclusive
+        :return: arrays of every column by marker id, markers that were never seen are left out
+        """
+        timestamps = self.columns['timestamp']
+        result = {}
+        for key in (self.rows if ids is None else ids):
+            row = self.rows.get(key)
+            if row is None:
+                continue
+
+            count = int(self.count[row])
+            start = (int(self.head[row]) - count) % self.length
+            # The ring holds at most two ordered runs: start to the end of the buffer and the wrapped rest
+            runs = [(start, min(start + count, self.length))]
+            if start + count > self.length:
+                runs.append((0, start + count - self.length))
+
+            parts = []
+            for low, high in runs:
+                times = timestamps[row, low:high]
+                first = low + int(np.searchsorted(times, since, 'left'))
+                last = low + int(np.searchsorted(times, until, 'right'))
+                if first < last:
+                    parts.append(slice(first, last))
+
+            if len(parts) <= 1:
+                part = parts[0] if parts else slice(0, 0)
+                result[key] = {name: column[row, part] for name, column in self.columns.items()}
+            else:
+                result[key] = {
+                    name: np.concatenate([column[row, part] for part in parts]) for name, column in self.columns.items()
+                }
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
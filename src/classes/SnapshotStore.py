@@ -0,0 +1,182 @@
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from src.utils import attach_shared_memory, unlink_shared_memory
+
+# Copies tried before a reader gives up on a game that is being written
+READ_RETRIES = 4
+
+META_DTYPE = np.dtype([
+    ('seq', np.uint64),
+    ('captured', np.float64),
+    ('length', np.int64),
+    ('etag', 'S48'),
+])
+
+
+class Snapshot(NamedTuple):
+    """Encoded game state read from the store"""
+    seq: int
+    etag: str
+    # Capture time of the tracker frame, NaN if unknown
+    captured: float
+    # None if the state did not fit in the slot
+    data: Optional[bytes]
+
+
+class SnapshotStore:
+    """Encoded game states in shared memory
+
+    The core process writes the encoded state of every game after every frame, API worker processes read them
+    without talking to the core. Every game has a slot with two buffers: the writer fills the buffer readers are not
+    using and then flips the current buffer, so readers normally copy a complete state on the first try. The sequence
+    number of a buffer is cleared while it is written, a reader that sees it change while copying tries again.
+
+    Attributes:
+        slots (int): Maximum number of games
+        size (int): Maximum size of an encoded state, larger states are not stored
+        games (Dict[str, int]): Slot of every stored game (writer side)
+    """
+
+    def __init__(self, slots: int = 50, size: int = 65536, name: Optional[str] = None):
+        self.slots: int = slots
+        self.size: int = size
+        self.games: Dict[str, int] = {}
+
+        layout = [
+            ('ids', np.dtype('S16'), (slots,)),
+            ('read_counts', np.dtype(np.uint64), (slots,)),
+            ('current', np.dtype(np.uint8), (slots,)),
+            ('meta', META_DTYPE, (slots, 2)),
+            ('data', np.dtype(np.uint8), (slots, 2, size)),
+        ]
+        offsets = []
+        total = 0
+        for _, dtype, shape in layout:
+            # Align every array to a cache line
+            total = (total + 63) // 64 * 64
+            offsets.append(total)
+            total += dtype.itemsize * int(np.prod(shape))
+
+        self.owner: bool = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=total)
+        else:
+            # The owner unlinks the segment
+            self.shm = attach_shared_memory(name)
+
+        arrays = [
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            for (_, dtype, shape), offset in zip(layout, offsets)
+        ]
+        self.ids, self.read_counts, self.current, self.meta, self.data = arrays
+        if self.owner:
+            self.ids[:] = b''
+            self.read_counts[:] = 0
+            self.current[:] = 0
+            self.meta['seq'] = 0
+
+    def __getstate__(self):
+        return {'slots': self.slots, 'size': self.size, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['slots'], state['size'], state['name'])
+
+    def write(self, game_id: str, seq: int, etag: str, captured: float, encoded: bytes) -> bool:
+        """
+        Stores the encoded state of a game
+        :param game_id: game id
+        :param seq: frame sequence number of the state
+        :param etag: entity tag of the state
+        :param captured: capture time of the tracker frame, NaN if unknown
+        :param encoded: encoded state
+        :return: False if there is no free slot
+        """
+        slot = self.games.get(game_id)
+        if slot is None:
+            free = np.flatnonzero(self.ids == b'')
+            if not len(free):
+                return False
+            slot = self.games[game_id] = int(free[0])
+            self.read_counts[slot] = 0
+            self.meta['seq'][slot] = 0
+            self.ids[slot] = game_id.encode()
+
+        back = 1 - int(self.current[slot])
+        meta = self.meta[slot, back]
+        meta['seq'] = 0
+        meta['captured'] = captured
+        meta['etag'] = etag.encode()
+        if len(encoded) <= self.size:
+            meta['length'] = len(encoded)
+            self.data[slot, back, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        else:
+            meta['length'] = -1
+        meta['seq'] = seq
+
+        self.current[slot] = back
+        return True
+
+    def seq(self, game_id: str) -> int:
+        """
+        Returns the sequence number of the stored state of a game without copying it, 0 if it is not stored
+        """
+        slot = self.find(game_id)
+        if slot is None:
+            return 0
+        return int(self.meta['seq'][slot, self.current[slot]])
+
+    def read_count(self, game_id: str) -> int:
+        """
+        Returns the number of times the state of a game was read, approximately as readers do not lock
+        """
+        slot = self.find(game_id)
+        return int(self.read_counts[slot]) if slot is not None else 0
+
+    def remove(self, game_id: str):
+        slot = self.games.pop(game_id, None)
+        if slot is not None:
+            self.ids[slot] = b''
+
+    def find(self, game_id: str) -> Optional[int]:
+        """
+        Returns the slot of a game, None if it is not stored
+        """
+        slots = np.flatnonzero(self.ids == game_id.encode())
+        return int(slots[0]) if len(slots) else None
+
+    def game_ids(self) -> List[str]:
+        return [game_id.decode() for game_id in self.ids.tolist() if game_id]
+
+    def read(self, game_id: str) -> Optional[Snapshot]:
+        """
+        Copies the stored state of a game
+        :param game_id: game id
+        :return: state, None if the game is not stored or kept changing while it was copied
+        """
+        key = game_id.encode()
+        slot = self.find(game_id)
+        if slot is None:
+            return None
+
+        for _ in range(READ_RETRIES):
+            current = int(self.current[slot])
+            seq, captured, length, etag = self.meta[slot, current].item()
+            data = self.data[slot, current, :length].tobytes() if length >= 0 else None
+
+            if seq != 0 and self.meta['seq'][slot, current] == seq and self.ids[slot] == key:
+                self.read_counts[slot] += 1
+                return Snapshot(seq, etag.decode(), captured, data)
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def close(self):
+        self.ids = self.read_counts = self.current = self.meta = self.data = None
+        self.shm.close()
+        if self.owner:
+            unlink_shared_memory(self.shm)
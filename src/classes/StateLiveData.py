@@ -1,36 +1,144 @@
 import logging
-from typing import Dict
+import math
+from typing import Dict, List, Optional, Set, Tuple
 
+import numpy as np
 from sledilnik.classes.Field import Field
 from sledilnik.classes.ObjectTracker import ObjectTracker
 from sledilnik.classes.TrackerLiveData import TrackerLiveData
+from src.classes.FieldIndex import FieldIndex
+from src.classes.FrameCodec import encode_timestamp
+from src.classes.FrameTrace import FrameTrace
+from src.classes.MotionEstimator import MotionEstimator, MotionFrame
+from src.classes.PositionHistory import PositionHistory
 
 
 class StateLiveData:
-    def __init__(self, config):
+    """Robots, objects and fields of one tracker frame
+
+    The StateServer parses frames into two instances in turn, so the one games and requests read is not changed while
+    the next frame is parsed. Both share the velocity estimator and the position history.
+    """
+
+    def __init__(self, config, motion: Optional[MotionEstimator] = None, history: Optional[PositionHistory] = None):
         self.logger = logging.getLogger('sledenje-objektom.StateLiveData')
         self.config = config
         self.fields: Dict[str, Field] = {}
         self.robots: Dict[int, ObjectTracker] = {}
-        self.objects: Dict[str, Dict[int, ObjectTracker]] = {}
+        self.objects: Dict[str, Dict[int, ObjectTracker]] = {object_type: {} for object_type in config['objects']}
         self.timestamp = None
+        # Tracker frame this state was parsed from
+        self.tracker_data: Optional[TrackerLiveData] = None
+        # Capture time of the frame used for velocities and history, seconds since the epoch
+        self.captured: float = math.nan
+        # Readers that keep this state while later frames are parsed, see StateServer.hold
+        self.holds: int = 0
+        # Stage timestamps of the parsed frame, set by the StateServer
+        self.trace: Optional[FrameTrace] = None
+
+        # Marker id -> dicts the marker belongs to, built once from the config
+        self.categories: Dict[int, Tuple[Dict[int, ObjectTracker], ...]] = self.index_categories()
+        self._tracked: Set[int] = set()
+
+        # Object id x field name membership table, computed once per frame
+        self.field_index = FieldIndex()
+        self.zone_rows: Dict[int, int] = {}
+        self.zones = np.zeros((0, 0), dtype=bool)
+
+        # Velocity of robots and objects, updated once per frame
+        self.motion = motion if motion is not None else MotionEstimator(
+            config.get('motion_smoothing', 0.5),
+            config.get('motion_max_gap', 0.5),
+            config.get('motion_max_horizon', 0.5)
+        )
+        self.motion_frame: MotionFrame = self.motion.update([], np.zeros((0, 2)), np.zeros(0), 0.0)
+        # Last history_length positions of every robot and object
+        self.history = history if history is not None else PositionHistory(config.get('history_length', 4096))
+
+    def index_categories(self) -> Dict[int, Tuple[Dict[int, ObjectTracker], ...]]:
+        categories = {}
+        for object_type, object_ids in self.config['objects'].items():
+            for object_id in object_ids:
+                categories[object_id] = categories.get(object_id, ()) + (self.objects[object_type],)
+        # Robots take precedence over objects, unless another game type tracks the marker as an object
+        dual_markers = set(self.config.get('dual_markers', ()))
+        for robot_id in self.config['robots']:
+            if robot_id in dual_markers:
+                categories[robot_id] = categories.get(robot_id, ()) + (self.robots,)
+            else:
+                categories[robot_id] = (self.robots,)
+        return categories
 
     def parse(self, data: TrackerLiveData):
+        self.tracker_data = data
         self.fields = data.fields
-        self.robots = {}
-        self.objects = {}
         self.timestamp = data.timestamp
 
-        # Loop through all objects
+        # Remove markers that are not tracked anymore
+        for key in self._tracked.difference(data.objects):
+            for category in self.categories[key]:
+                category.pop(key, None)
+        self._tracked.clear()
+
+        # Update tracked markers in place
         for key, obj in data.objects.items():
-            # Check if object is a robot
-            if key in self.config['robots']:
-                self.robots[key] = obj
-            else:
-                # Loop through all object types
-                for object_type in self.config['objects']:
-                    if object_type not in self.objects:
-                        self.objects[object_type] = {}
-                    # Check if object is of this type
-                    if key in self.config['objects'][object_type]:
-                        self.objects[object_type][key] = obj
+            categories = self.categories.get(key)
+            if categories is None:
+                continue
+            self._tracked.add(key)
+            for category in categories:
+                category[key] = obj
+
+    def tracked(self) -> List[Tuple[int, ObjectTracker]]:
+        """
+        Returns (id, object) of all robots and objects in this frame, once per marker
+        """
+        tracked = dict(self.robots)
+        for objects in self.objects.values():
+            tracked.update(objects)
+        return list(tracked.items())
+
+    def compute_zones(self):
+        """
+        Computes which robots and objects lie in which fields
+        """
+        self.field_index.update(self.fields)
+
+        tracked = self.tracked()
+        self.zone_rows = {key: row for row, (key, _) in enumerate(tracked)}
+        self.zones = self.field_index.contains(np.array([obj.position.to_tuple() for _, obj in tracked]))
+
+    def frame_time(self, received: float) -> float:
+        """
+        Returns the capture time of the frame
+        :param received: time the frame was received, used when the tracker did not stamp it
+        """
+        timestamp = encode_timestamp(self.timestamp)
+        return received if math.isnan(timestamp) else timestamp
+
+    def compute_motion(self, timestamp: float):
+        """
+        Updates velocities and position history of robots and objects
+        :param timestamp: capture time of the frame
+        """
+        self.captured = timestamp
+        tracked = self.tracked()
+        ids = [key for key, _ in tracked]
+        position = np.array([obj.position.to_tuple() for _, obj in tracked], dtype=np.float64).reshape(-1, 2)
+        direction = np.array([obj.direction for _, obj in tracked], dtype=np.float64)
+
+        self.motion_frame = self.motion.update(ids, position, direction, timestamp)
+        self.history.append(ids, position, direction, timestamp)
+
+    def in_field(self, object_id: int, field_name: str) -> bool:
+        """
+        Checks if object was in field in this frame.
+        :param object_id: robot or object id
+        :param field_name: name of the field
+        :return: True if object in field
+        """
+        row = self.zone_rows.get(object_id)
+        column = self.field_index.columns.get(field_name)
+        if row is None or column is None:
+            return False
+        return bool(self.zones[row, column])
@@ -0,0 +1,106 @@
+from typing import Optional, Set
+
+from gevent.queue import Queue, Empty, Full
+
+
+def format_event(frame: bytes, seq: int) -> bytes:
+    """
+    Formats an encoded frame as a server-sent event
+    """
+    return b'id: %d\ndata: %s\n\n' % (seq, frame)
+
+
+class StreamSubscriber:
+    """Bounded buffer of messages for one stream client
+
+    When the buffer is full the oldest message is dropped, so a slow client skips ahead to the newest frame instead
+    of stalling the publisher. A client that keeps falling behind is closed.
+
+    Attributes:
+        lag (int): Number of messages dropped since the client last read one
+        dropped (int): Total number of dropped messages
+        closed (bool): Set when the subscriber was closed by the hub
+    """
+
+    def __init__(self, buffer_size: int, max_lag: int):
+        self.queue = Queue(buffer_size)
+        self.max_lag = max_lag
+        self.lag = 0
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, message: bytes):
+        if self.closed:
+            return
+
+        try:
+            self.queue.put_nowait(message)
+        except Full:
+            # Skip ahead: throw away the oldest message to make room for the newest one
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                pass
+            self.queue.put_nowait(message)
+            self.lag += 1
+            self.dropped += 1
+
+            if self.lag > self.max_lag:
+                self.close()
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        """
+        Waits for the next message
+        :param timeout: seconds to wait
+        :return: message or None on timeout or when the subscriber was closed
+        """
+        try:
+            message = self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+        self.lag = 0
+        return message
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Wake up the reader
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class StreamHub:
+    """Fan-out of encoded frames to stream subscribers
+
+    Every published frame is formatted as a server-sent event once and pushed to each subscriber without blocking.
+
+    Attributes:
+        subscribers (Set[StreamSubscriber]): Currently connected subscribers
+    """
+
+    def __init__(self, buffer_size: int = 4, max_lag: int = 300):
+        self.buffer_size = buffer_size
+        self.max_lag = max_lag
+        self.subscribers: Set[StreamSubscriber] = set()
+
+    def subscribe(self) -> StreamSubscriber:
+        subscriber = StreamSubscriber(self.buffer_size, self.max_lag)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, frame: bytes, seq: int):
+        message = format_event(frame, seq)
+        for subscriber in list(self.subscribers):
+            subscriber.push(message)
+            if subscriber.closed:
+                self.subscribers.discard(subscriber)
+
+    def close(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self.subscribers.clear()
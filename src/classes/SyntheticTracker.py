@@ -0,0 +1,161 @@
+import math
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.ObjectTracker import ObjectTracker
+from sledilnik.classes.Point import Point
+from sledilnik.classes.TrackerLiveData import TrackerLiveData
+from src.classes.FrameCodec import make_frame
+from src.classes.TrackerSource import TrackerSource
+
+# Arena size in tracker units, matches map_virtual_corners in tracker_config.yaml
+ARENA_WIDTH = 3600
+ARENA_HEIGHT = 2100
+
+
+class SyntheticTracker(TrackerSource):
+    """Tracker that generates frames without a camera
+
+    Moves robots and objects from the game config along random or scripted paths and sends a frame with all of them
+    and the configured fields at a fixed frame rate. When more robots or objects are requested than the config lists,
+    extra marker ids are added to the config, so the whole pipeline sees them.
+
+    Attributes:
+        fps (float): Frames per second
+        robots (int): Number of robots, None for the robots in the config
+        objects (int): Number of objects of every type, None for the objects in the config
+        path (str): 'random' for random walks bouncing off the arena walls, 'circle' for circles around the arena
+        speed (float): Marker speed in tracker units per second
+    """
+
+    def __init__(self, fps: float = 30, robots: Optional[int] = None, objects: Optional[int] = None,
+                 path: str = 'random', speed: float = 300, seed: int = 0):
+        if path not in ('random', 'circle'):
+            raise ValueError(f'Unknown synthetic path: {path}')
+
+        self.fps = fps
+        self.robots = robots
+        self.objects = objects
+        self.path = path
+        self.speed = speed
+        self.seed = seed
+
+        self.ids: List[int] = []
+        self.field_names: List[str] = []
+
+    @classmethod
+    def from_config(cls, game_config: Dict, **overrides) -> 'SyntheticTracker':
+        """
+        Creates a tracker from the optional synthetic section of the game config, overridden by keyword arguments
+        """
+        settings = dict(game_config.get('synthetic', {}))
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    def prepare(self, game_config: Dict):
+        next_id = max(
+            list(game_config['robots']) + [o for objects in game_config['objects'].values() for o in objects],
+            default=-1
+        ) + 1
+
+        robot_ids = list(game_config['robots'])
+        if self.robots is not None:
+            while len(robot_ids) < self.robots:
+                game_config['robots'][next_id] = f'Synthetic {next_id}'
+                robot_ids.append(next_id)
+                next_id += 1
+            robot_ids = robot_ids[:self.robots]
+
+        object_ids = []
+        for object_type in game_config['objects']:
+            ids = list(game_config['objects'][object_type])
+            if self.objects is not None:
+                while len(ids) < self.objects:
+                    game_config['objects'][object_type].append(next_id)
+                    ids.append(next_id)
+                    next_id += 1
+                ids = ids[:self.objects]
+            object_ids.extend(ids)
+
+        self.ids = robot_ids + object_ids
+        self.field_names = list(game_config['fields_names'])
+
+    def fields(self) -> Dict[str, Field]:
+        """
+        Lays the fields out on the arena: the first field covers the whole arena, the others are placed in a grid
+        """
+        result = {}
+        if not self.field_names:
+            return result
+
+        result[self.field_names[0]] = self._field(0, 0, ARENA_WIDTH, ARENA_HEIGHT)
+
+        others = self.field_names[1:]
+        columns = max(1, math.ceil(math.sqrt(len(others))))
+        rows = max(1, math.ceil(len(others) / columns))
+        width = ARENA_WIDTH / columns
+        height = ARENA_HEIGHT / rows
+        for i, name in enumerate(others):
+            x = (i % columns) * width
+            y = (i // columns) * height
+            result[name] = self._field(x + width * 0.25, y + height * 0.25, width * 0.5, height * 0.5)
+        return result
+
+    @staticmethod
+    def _field(x: float, y: float, width: float, height: float) -> Field:
+        return Field(Point(x, y + height), Point(x + width, y + height), Point(x + width, y), Point(x, y))
+
+    def frames(self) -> Iterator[TrackerLiveData]:
+        """
+        Generates frames one period apart, without pacing, stamped with the current time
+        """
+        rng = np.random.default_rng(self.seed)
+        count = len(self.ids)
+        fields = self.fields()
+
+        positions = rng.uniform((0, 0), (ARENA_WIDTH, ARENA_HEIGHT), (count, 2))
+        headings = rng.uniform(0, 2 * math.pi, count)
+        # Circle paths: center of the arena, radius and phase per marker
+        radius = rng.uniform(200, min(ARENA_WIDTH, ARENA_HEIGHT) / 2, count)
+        phase = rng.uniform(0, 2 * math.pi, count)
+        center = np.array((ARENA_WIDTH / 2, ARENA_HEIGHT / 2))
+
+        period = 1 / self.fps
+        frame = 0
+        while True:
+            if self.path == 'circle':
+                angle = phase + frame * period * self.speed / radius
+                positions = center + radius[:, None] * np.column_stack((np.cos(angle), np.sin(angle)))
+                headings = angle + math.pi / 2
+            else:
+                headings += rng.normal(0, 0.2, count)
+                positions += period * self.speed * np.column_stack((np.cos(headings), np.sin(headings)))
+                # Bounce off the walls
+                for axis, limit in enumerate((ARENA_WIDTH, ARENA_HEIGHT)):
+                    outside = (positions[:, axis] < 0) | (positions[:, axis] > limit)
+                    if axis == 0:
+                        headings[outside] = math.pi - headings[outside]
+                    else:
+                        headings[outside] = -headings[outside]
+                    positions[:, axis] = np.clip(positions[:, axis], 0, limit)
+
+            directions = np.degrees(headings) % 360
+            objects = {
+                oid: ObjectTracker(oid, Point(x, y), direction)
+                for oid, (x, y), direction in zip(self.ids, positions.tolist(), directions.tolist())
+            }
+            yield make_frame(time.time(), objects, fields)
+            frame += 1
+
+    def start(self, queue):
+        period = 1 / self.fps
+        started = time.time()
+        for frame, data in enumerate(self.frames(), 1):
+            queue.put(data)
+
+            delay = started + frame * period - time.time()
+            if delay > 0:
+                time.sleep(delay)
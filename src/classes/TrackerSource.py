@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+
+
+class TrackerSource(ABC):
+    """Source of tracker frames
+
+    TrackerServer calls prepare with the game config in the server process, then runs start in the tracker process.
+    start puts TrackerLiveData frames into the queue (a multiprocessing.Queue or a FrameRing) and should not return
+    while it has frames to send, TrackerServer restarts sources that exit. sledilnik's TrackerGame has the same start
+    method and is used when no source is given.
+    """
+
+    def prepare(self, game_config: Dict):
+        """
+        Called with the game config before the tracker process starts. Sources may add their robots, objects and
+        fields to the config.
+        """
+        pass
+
+    @abstractmethod
+    def start(self, queue):
+        pass
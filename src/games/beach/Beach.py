@@ -1,14 +1,13 @@
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from uuid import uuid4
 
 from flask_restx import Api, fields
 
-from sledilnik.classes.ObjectTracker import ObjectTracker
 from src.classes.Timer import Timer
 from src.games.beach.BeachTeam import BeachTeam
 from src.servers.GameServer import GameServer
-from src.utils import check_if_object_in_area, create_logger
+from src.utils import create_logger
 
 
 class Beach(GameServer):
@@ -95,19 +94,19 @@ class Beach(GameServer):
                 # TODO: Refactor to clean up
 
                 # Check if robot is charging
-                if check_if_object_in_area(robot.position, self.state_data.fields['blue_plastic']) and \
+                if self.state_data.in_field(robot.id, 'blue_plastic') and \
                         (self.charging_stations[1] is None or self.charging_stations[1] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[1] = robot.id
-                elif check_if_object_in_area(robot.position, self.state_data.fields['blue_glass']) and \
+                elif self.state_data.in_field(robot.id, 'blue_glass') and \
                         (self.charging_stations[2] is None or self.charging_stations[2] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[2] = robot.id
-                elif check_if_object_in_area(robot.position, self.state_data.fields['red_plastic']) and \
+                elif self.state_data.in_field(robot.id, 'red_plastic') and \
                         (self.charging_stations[3] is None or self.charging_stations[3] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[3] = robot.id
-                elif check_if_object_in_area(robot.position, self.state_data.fields['red_glass']) and \
+                elif self.state_data.in_field(robot.id, 'red_glass') and \
                         (self.charging_stations[4] is None or self.charging_stations[4] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[4] = robot.id
@@ -144,41 +143,38 @@ class Beach(GameServer):
         # If 'plastic' is in the plastic container, add points to the team, if 'plastic' is in the glass container, subtract points from the team
         if 'plastic' in self.state_data.objects:
             for plastic_key in self.state_data.objects['plastic']:
-                plastic = self.state_data.objects['plastic'][plastic_key]
                 for team_key in self.teams:
                     team = self.teams[team_key]
-                    if check_if_object_in_area(plastic.position, self.state_data.fields[f'{team.color}_plastic']):
+                    if self.state_data.in_field(plastic_key, f'{team.color}_plastic'):
                         scores[team.robot_id] += self.game_config['points']['good']
-                    elif check_if_object_in_area(plastic.position, self.state_data.fields[f'{team.color}_glass']):
+                    elif self.state_data.in_field(plastic_key, f'{team.color}_glass'):
                         scores[team.robot_id] += self.game_config['points']['wrong']
 
         # If 'glass' is in the glass container, add points to the team, if 'glass' is in the plastic container, subtract points from the team
         if 'glass' in self.state_data.objects:
             for glass_key in self.state_data.objects['glass']:
-                glass = self.state_data.objects['glass'][glass_key]
                 for team_key in self.teams:
                     team = self.teams[team_key]
-                    if check_if_object_in_area(glass.position, self.state_data.fields[f'{team.color}_glass']):
+                    if self.state_data.in_field(glass_key, f'{team.color}_glass'):
                         scores[team.robot_id] += self.game_config['points']['good']
-                    elif check_if_object_in_area(glass.position, self.state_data.fields[f'{team.color}_plastic']):
+                    elif self.state_data.in_field(glass_key, f'{team.color}_plastic'):
                         scores[team.robot_id] += self.game_config['points']['wrong']
 
         # If 'shells' is in any container, subtract points from the team
         if 'shells' in self.state_data.objects:
             for shells_key in self.state_data.objects['shells']:
-                shells = self.state_data.objects['shells'][shells_key]
                 for team_key in self.teams:
                     team = self.teams[team_key]
-                    if (check_if_object_in_area(shells.position, self.state_data.fields[f'{team.color}_plastic']) or
-                        check_if_object_in_area(shells.position, self.state_data.fields[f'{team.color}_glass'])):
+                    if (self.state_data.in_field(shells_key, f'{team.color}_plastic') or
+                        self.state_data.in_field(shells_key, f'{team.color}_glass')):
                         scores[team.robot_id] += self.game_config['points']['bad']
 
         for team_key in self.teams:
             team = self.teams[team_key]
             team.score = scores.get(team.robot_id, 0)
 
-    def to_json(self):
-        result = super().to_json()
+    def to_json(self, at: Optional[float] = None):
+        result = super().to_json(at)
         merged_objects = {}
         for ot in result['objects']:
             for o in result['objects'][ot]:
@@ -199,7 +195,7 @@ class Beach(GameServer):
         result['objects'] = fields.Nested(
             api.model('Objects', {
                 str(o): fields.Nested(
-                    ObjectTracker.to_model(api),
+                    cls.object_model(api),
                     required=False
                 )
                 for ot in game_config['objects']
@@ -1,14 +1,13 @@
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from uuid import uuid4
 
 from flask_restx import Api, fields
 
-from sledilnik.classes.ObjectTracker import ObjectTracker
 from src.classes.Timer import Timer
 from src.games.mine.MineTeam import MineTeam
 from src.servers.GameServer import GameServer
-from src.utils import check_if_object_in_area, create_logger
+from src.utils import create_logger
 
 
 class Mine(GameServer):
@@ -84,11 +83,11 @@ class Mine(GameServer):
                 robot = self.state_data.robots[team.robot_id]
 
                 # Check if robot is charging
-                if check_if_object_in_area(robot.position, self.state_data.fields['charging_station_1']) and \
+                if self.state_data.in_field(robot.id, 'charging_station_1') and \
                         (self.charging_stations[1] is None or self.charging_stations[1] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[1] = robot.id
-                elif check_if_object_in_area(robot.position, self.state_data.fields['charging_station_2']) and \
+                elif self.state_data.in_field(robot.id, 'charging_station_2') and \
                         (self.charging_stations[2] is None or self.charging_stations[2] == robot.id):
                     self.teams[robot.id].charge(self.game_config['charging_time'])
                     self.charging_stations[2] = robot.id
@@ -116,26 +115,24 @@ class Mine(GameServer):
 
         if 'good_ore' in self.state_data.objects:
             for good_ore_key in self.state_data.objects['good_ore']:
-                good_ore = self.state_data.objects['good_ore'][good_ore_key]
                 for team_key in self.teams:
                     team = self.teams[team_key]
-                    if check_if_object_in_area(good_ore.position, self.state_data.fields[f'{team.color}_basket']):
+                    if self.state_data.in_field(good_ore_key, f'{team.color}_basket'):
                         scores[team.robot_id] += self.game_config['points']['good']
 
         if 'bad_ore' in self.state_data.objects:
             for bad_ore_key in self.state_data.objects['bad_ore']:
-                bad_ore = self.state_data.objects['bad_ore'][bad_ore_key]
                 for team_key in self.teams:
                     team = self.teams[team_key]
-                    if check_if_object_in_area(bad_ore.position, self.state_data.fields[f'{team.color}_basket']):
+                    if self.state_data.in_field(bad_ore_key, f'{team.color}_basket'):
                         scores[team.robot_id] += self.game_config['points']['bad']
 
         for team_key in self.teams:
             team = self.teams[team_key]
             team.score = scores.get(team.robot_id, 0)
 
-    def to_json(self):
-        result = super().to_json()
+    def to_json(self, at: Optional[float] = None):
+        result = super().to_json(at)
         merged_objects = {}
         for ot in result['objects']:
             for o in result['objects'][ot]:
@@ -156,7 +153,7 @@ class Mine(GameServer):
         result['objects'] = fields.Nested(
             api.model('Objects', {
                 str(o): fields.Nested(
-                    ObjectTracker.to_model(api),
+                    cls.object_model(api),
                     required=False
                 )
                 for ot in game_config['objects']
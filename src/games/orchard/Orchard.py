@@ -1,6 +1,5 @@
 import logging
 
-from src.utils import check_if_object_in_area
 from src.servers.GameServer import GameServer
 
 
@@ -35,14 +34,14 @@ class Orchard(GameServer):
             if healthy_hive.id in self.secures_hives:
                 continue
 
-            if check_if_object_in_area(healthy_hive.position, self.state_data.fields['team_1_zone']):
+            if self.state_data.in_field(healthy_hive.id, 'team_1_zone'):
                 self.hive_zones[healthy_hive.id].add('team_1_zone')
-            elif check_if_object_in_area(healthy_hive.position, self.state_data.fields['team_2_zone']):
+            elif self.state_data.in_field(healthy_hive.id, 'team_2_zone'):
                 self.hive_zones[healthy_hive.id].add('team_2_zone')
-            elif check_if_object_in_area(healthy_hive.position, self.state_data.fields['neutral_zone']):
+            elif self.state_data.in_field(healthy_hive.id, 'neutral_zone'):
                 self.hive_zones[healthy_hive.id].add('neutral_zone')
 
-            if check_if_object_in_area(healthy_hive.position, self.state_data.fields['team_1_basket']):
+            if self.state_data.in_field(healthy_hive.id, 'team_1_basket'):
                 self.logger.debug("Healthy hive %s is in team 1 basket" % healthy_hive.id)
                 self.secures_hives.add(healthy_hive.id)
                 if 'team_2_zone' in self.hive_zones[healthy_hive.id]:
@@ -52,7 +51,7 @@ class Orchard(GameServer):
                 else:
                     self.team_1_healthy_hives_score += self.state_data.config['points']['home']
 
-            if check_if_object_in_area(healthy_hive.position, self.state_data.fields['team_2_basket']):
+            if self.state_data.in_field(healthy_hive.id, 'team_2_basket'):
                 self.logger.debug("Healthy hive %s is in team 2 basket" % healthy_hive.id)
                 self.secures_hives.add(healthy_hive.id)
 
@@ -64,9 +63,9 @@ class Orchard(GameServer):
                     self.team_1_healthy_hives_score += self.state_data.config['points']['home']
 
         for diseased_hive in self.state_data.objects['diseased_hives'].values():
-            if check_if_object_in_area(diseased_hive.position, self.state_data.fields['team_1_zone']):
+            if self.state_data.in_field(diseased_hive.id, 'team_1_zone'):
                 team_1_diseased_count += 1
-            elif check_if_object_in_area(diseased_hive.position, self.state_data.fields['team_2_zone']):
+            elif self.state_data.in_field(diseased_hive.id, 'team_2_zone'):
                 team_2_diseased_count += 1
 
         self.team_1.score = self.team_1_healthy_hives_score + \
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import math
+import socket
+import time
+from http.client import HTTPConnection
+from timeit import default_timer as timer
+from typing import Dict, Optional, Tuple
+
+import gevent
+from flask import Flask, Response, request
+from flask_cors import CORS
+from gevent import socket as gsocket
+from gevent.pywsgi import WSGIServer
+
+from src.classes.SnapshotStore import Snapshot, SnapshotStore
+from src.classes.StreamHub import format_event
+from src.servers.Server import FrameBroadcast
+from src.utils import create_logger, dump_json, wait_timeout
+
+# Seconds between checks of the store while long-polls or streams wait for a new frame
+POLL_INTERVAL = 0.005
+# Seconds to wait for the core process to answer a forwarded request
+FORWARD_TIMEOUT = 30
+# Headers that only apply to one connection, they are not forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer', 'transfer-encoding',
+    'upgrade', 'content-length'
+}
+
+
+class CoreConnection(HTTPConnection):
+    """HTTP connection to the core process that yields to other greenlets while waiting"""
+
+    def connect(self):
+        self.sock = gsocket.create_connection((self.host, self.port), self.timeout)
+
+
+class StoreWatcher:
+    """Turns new frames in the snapshot store into a FrameBroadcast per game
+
+    The core does not signal workers when it writes a frame, so one greenlet per worker checks the sequence number of
+    every game that long-polls or streams wait for and publishes on its broadcast when it changes or the game is
+    removed. The greenlet only runs while there are waiters.
+
+    Attributes:
+        store (SnapshotStore): Encoded game states written by the core
+        broadcasts (Dict[str, FrameBroadcast]): Broadcast of every watched game
+    """
+
+    def __init__(self, store: SnapshotStore, interval: float = POLL_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.broadcasts: Dict[str, FrameBroadcast] = {}
+        self._seqs: Dict[str, int] = {}
+        self._waiters: Dict[str, int] = {}
+        self._greenlet: Optional[gevent.Greenlet] = None
+
+    def wait(self, game_id: str, after: int, timeout: float) -> int:
+        """
+        Blocks the calling greenlet until the store has a frame of the game newer than after or the game is removed
+        :param game_id: game id
+        :param after: last sequence number the caller has seen
+        :param timeout: maximum number of seconds to wait
+        :return: sequence number of the game in the store, 0 if it was removed
+        """
+        broadcast = self.broadcasts.get(game_id)
+        if broadcast is None:
+            broadcast = self.broadcasts[game_id] = FrameBroadcast()
+            self._seqs[game_id] = self.store.seq(game_id)
+        self._waiters[game_id] = self._waiters.get(game_id, 0) + 1
+        if self._greenlet is None:
+            self._greenlet = gevent.spawn(self._run)
+
+        try:
+            deadline = timer() + timeout
+            while True:
+                # Reading the store does not yield, so a frame written after this check is published to the wait
+                seq = self.store.seq(game_id)
+                remaining = deadline - timer()
+                if seq > after or seq == 0 or remaining <= 0:
+                    return seq
+                broadcast.wait(broadcast.seq, remaining)
+        finally:
+            self._waiters[game_id] -= 1
+            if self._waiters[game_id] == 0:
+                del self._waiters[game_id]
+                del self.broadcasts[game_id]
+                del self._seqs[game_id]
+
+    def _run(self):
+        try:
+            while self.broadcasts:
+                gevent.sleep(self.interval)
+                for game_id, broadcast in list(self.broadcasts.items()):
+                    seq = self.store.seq(game_id)
+                    if seq != self._seqs.get(game_id, seq):
+                        self._seqs[game_id] = seq
+                        broadcast.publish()
+        finally:
+            self._greenlet = None
+
+
+class ApiWorker:
+    """API process serving game states from the snapshot store
+
+    Workers share the listening socket of the API. Game states, long-polls and event streams are served from the
+    encoded states the core process writes to shared memory; everything else, including all changes to games, is
+    forwarded to the core process over a local HTTP connection.
+
+    Attributes:
+        listener (socket.socket): Listening socket shared by all workers
+        store (SnapshotStore): Encoded game states written by the core
+        core_address (Tuple[str, int]): Address of the API of the core process
+    """
+
+    def __init__(self, listener: socket.socket, store: SnapshotStore, core_address: Tuple[str, int], log_level: str,
+                 long_poll_timeout: float, stream_keepalive: float):
+        self.listener = listener
+        self.store = store
+        self.core_address = core_address
+        self.log_level = log_level
+        self.long_poll_timeout = long_poll_timeout
+        self.stream_keepalive = stream_keepalive
+
+    def run(self):
+        """
+        Serves requests until the process is terminated, target of the worker process
+        """
+        logger = create_logger('restapi.ApiWorker', self.log_level)
+        logger.info('API worker started.')
+
+        # Accepting has to yield when another worker took the connection
+        listener = gsocket.socket(
+            self.listener.family, self.listener.type, self.listener.proto, fileno=self.listener.detach()
+        )
+        WSGIServer(listener, self.create_app()).serve_forever()
+
+    def forward(self) -> Response:
+        """
+        Sends the current request to the core process and returns its response
+        """
+        path = request.full_path if request.query_string else request.path
+        headers = {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+        headers['X-Forwarded-For'] = request.remote_addr or ''
+
+        connection = CoreConnection(*self.core_address, timeout=FORWARD_TIMEOUT)
+        try:
+            connection.request(request.method, path, request.get_data() or None, headers)
+            response = connection.getresponse()
+            body = response.read()
+            status = response.status
+            headers = [(key, value) for key, value in response.getheaders() if key.lower() not in HOP_BY_HOP_HEADERS]
+        finally:
+            connection.close()
+        return Response(body, status=status, headers=headers)
+
+    @staticmethod
+    def frame_headers(response: Response, snapshot: Snapshot) -> Response:
+        response.set_etag(snapshot.etag)
+        response.headers['X-Frame-Seq'] = str(snapshot.seq)
+        if not math.isnan(snapshot.captured):
+            response.headers['X-Frame-Age'] = '%.4f' % (time.time() - snapshot.captured)
+        return response
+
+    def create_app(self) -> Flask:
+        app = Flask(__name__)
+        CORS(app, supports_credentials=True)
+        store = self.store
+        watcher = StoreWatcher(store)
+
+        @app.route('/game/', methods=['GET'])
+        def game_list():
+            return Response(dump_json(store.game_ids()), mimetype='application/json')
+
+        @app.route('/game/<string:game_id>', methods=['GET'])
+        def game(game_id):
+            snapshot = store.read(game_id)
+            # Unknown ids may be other routes or games that were just created
+            if snapshot is None or request.args.get('extrapolate', 'false').lower() in ('1', 'true', 'yes'):
+                return self.forward()
+
+            after = request.args.get('after', type=int)
+            if after is not None:
+                timeout = wait_timeout(request.args.get('timeout', type=float), self.long_poll_timeout)
+                if snapshot.seq <= after:
+                    watcher.wait(game_id, after, timeout)
+                    snapshot = store.read(game_id)
+                    if snapshot is None:
+                        return self.forward()
+
+            if request.if_none_match.contains(snapshot.etag):
+                return self.frame_headers(Response(status=304), snapshot)
+            if snapshot.data is None:
+                return self.forward()
+            return self.frame_headers(Response(snapshot.data, mimetype='application/json'), snapshot)
+
+        @app.route('/game/<string:game_id>/stream', methods=['GET'])
+        def game_stream(game_id):
+            if store.find(game_id) is None:
+                return self.forward()
+
+            def events():
+                seq = store.seq(game_id)
+                sent = timer()
+                while store.find(game_id) is not None:
+                    if watcher.wait(game_id, seq, max(self.stream_keepalive - (timer() - sent), 0)) > seq:
+                        snapshot = store.read(game_id)
+                        if snapshot is not None and snapshot.data is not None:
+                            seq = snapshot.seq
+                            sent = timer()
+                            yield format_event(snapshot.data, seq)
+                    elif timer() - sent >= self.stream_keepalive:
+                        sent = timer()
+                        yield b': keepalive\n\n'
+
+            return Response(
+                events(),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        @app.route('/', defaults={'path': ''}, methods=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+        @app.route('/<path:path>', methods=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+        def core(path):
+            return self.forward()
+
+        return app
@@ -1,69 +1,232 @@
 # -*- coding: utf-8 -*-
-import importlib
+import atexit
 import logging
-from multiprocessing import freeze_support
-from queue import Queue
-from typing import Dict, List
-
-from flask import Flask, jsonify
+import math
+import socket
+import time
+from timeit import default_timer as timer
+from multiprocessing import freeze_support, get_context
+from typing import Dict, List, Optional
+
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from flask_httpauth import HTTPBasicAuth
 from flask_restx import Resource, Api, fields
+import gevent
+from gevent.pool import Pool
 from gevent.pywsgi import WSGIServer
 
+from src.classes.GameFrame import GameFrame
+from src.classes.GameRegistry import GameRegistry
+from src.classes.GameTypeRegistry import GameTypeRegistry
+from src.classes.Metrics import METRICS
+from src.classes.SnapshotStore import SnapshotStore
 from src.restapi.ApiError import ApiError
+from src.restapi.ApiWorker import ApiWorker
+from src.servers.Arena import Arena
 from src.servers.GameServer import GameServer
-from src.servers.StateServer import StateServer
-from src.servers.TrackerServer import TrackerServer
-from src.utils import read_config, create_logger
+from src.utils import create_logger, dump_json, setup_logging, logging_stats, wait_timeout
+
+# Seconds between keepalive comments on idle event streams
+STREAM_KEEPALIVE = 15
+# Maximum number of seconds a long-poll request waits for a new frame
+LONG_POLL_TIMEOUT = 10
+# Seconds between checks for idle games
+GAME_EXPIRE_INTERVAL = 30
+# Seconds between checks for API worker processes that stopped
+WORKER_CHECK_INTERVAL = 5
 
 
 class GameApi:
-    def __init__(self, game_name: str):
+    def __init__(self, game_name: str, tracker=None, record_path: Optional[str] = None, port: int = 8088,
+                 trace_path: Optional[str] = None, workers: int = 0, shards: int = 0):
         freeze_support()
-        self.game_config: dict = read_config(f'./src/games/{game_name.lower()}/game_config.yaml')
-
-        logger = create_logger('restapi.GameApi', self.game_config['log_level'])
-        logger.info('Started')
-
-        self.game_name: str = game_name.capitalize()
-        self.GameClass = getattr(
-            importlib.import_module(f"src.games.{self.game_name.lower()}.{self.game_name}"),
-            self.game_name
+        # Comma separated game names, the first one is the default type and sets the server settings
+        self.game_types: GameTypeRegistry = GameTypeRegistry(game_name.split(','))
+        # Config of the tracker and state pipeline shared by all game types
+        self.game_config: dict = self.game_types.shared_config()
+        if shards > 0:
+            self.game_config['game_shards'] = shards
+
+        setup_logging(self.game_config.get('log_debug_rate_limit', 10))
+        self.logger = create_logger('restapi.GameApi', self.game_config['log_level'])
+        self.logger.info('Started with game types %s' % ', '.join(game_type.name for game_type in self.game_types))
+
+        self.game_servers: GameRegistry = GameRegistry(
+            self.game_config.get('max_games', 50),
+            self.game_config.get('game_idle_ttl', 3600),
+            self.release_game_server
         )
 
-        self.game_servers: Dict[str, GameServer] = {}
-        self.server_queue: Queue = Queue()
+        # Every arena has its own tracker process, state and scheduler, games are bound to one when created
+        self.arenas: Dict[str, Arena] = {}
+        for arena in Arena.from_config(self.game_config, tracker, record_path, trace_path):
+            self.arenas[arena.name] = arena
+            arena.start()
 
-        self.tracker_server = TrackerServer(self.game_config)
-        self.tracker_server.start()
+        self.expire_greenlet = gevent.spawn(self.expire_game_servers)
 
-        self.state_server: StateServer = StateServer(self.tracker_server, self.game_config)
-        self.state_server.start()
+        # Encoded game states for API worker processes, None when this process serves all requests
+        self.snapshots: Optional[SnapshotStore] = None
+        self._snapshot_reads: Dict[str, int] = {}
+        self.workers: List = []
 
-        self.rest_server = WSGIServer(('0.0.0.0', 8088), create_api(self))
+        # Greenlets serving requests, counted on /metrics
+        self.request_pool = Pool()
+        if workers > 0:
+            # Workers accept on the public port and forward what they cannot serve to the core on localhost
+            self.rest_server = WSGIServer(('127.0.0.1', 0), create_api(self), spawn=self.request_pool)
+            self.rest_server.init_socket()
+            self.start_workers(workers, port)
+        else:
+            self.rest_server = WSGIServer(('0.0.0.0', port), create_api(self), spawn=self.request_pool)
+
+        self.register_metrics()
 
     def start(self):
         self.rest_server.serve_forever()
 
-    def create_game_server(self, teams: List[int], game_id=None) -> GameServer:
-        new_game = self.GameClass(self.state_server, self.game_config, teams)
-        new_game.start()
+    def start_workers(self, count: int, port: int):
+        """
+        Starts API worker processes that serve game states from shared memory
+        :param count: number of worker processes
+        :param port: public port of the API
+        """
+        self.snapshots = SnapshotStore(
+            self.game_config.get('max_games', 50),
+            self.game_config.get('api_snapshot_size', 65536)
+        )
+        atexit.register(self.snapshots.close)
+
+        listener = socket.create_server(('0.0.0.0', port), backlog=1024)
+        # Workers start with a fresh interpreter, without the hub and greenlets of this process
+        context = get_context('spawn')
+        worker = ApiWorker(
+            listener,
+            self.snapshots,
+            self.rest_server.socket.getsockname()[:2],
+            self.game_config['log_level'],
+            LONG_POLL_TIMEOUT,
+            STREAM_KEEPALIVE
+        )
+
+        def spawn():
+            process = context.Process(target=worker.run, daemon=True)
+            process.start()
+            return process
+
+        self.workers = [spawn() for _ in range(count)]
+        for arena in self.arenas.values():
+            gevent.spawn(self.publish_snapshots_forever, arena)
+        gevent.spawn(self.supervise_workers, spawn)
+
+    def publish_snapshots(self):
+        """
+        Writes the encoded state of every game with a new frame to the snapshot store
+        """
+        for game_id, game_server in self.game_servers.items():
+            frame = game_server.frame
+            if self.snapshots.seq(game_id) != frame.seq:
+                self.snapshots.write(
+                    game_id,
+                    frame.seq,
+                    frame.etag,
+                    frame.state.trace.origin() if frame.state.trace is not None else math.nan,
+                    game_server.to_json_bytes()
+                )
+
+            # Reads in the workers count as use of the game
+            reads = self.snapshots.read_count(game_id)
+            if reads != self._snapshot_reads.get(game_id):
+                self._snapshot_reads[game_id] = reads
+                self.game_servers.touch(game_id)
+
+    def publish_snapshots_forever(self, arena: Arena):
+        seq = 0
+        while True:
+            seq = arena.scheduler.updated.wait(seq)
+            self.publish_snapshots()
+
+    def supervise_workers(self, spawn):
+        while True:
+            gevent.sleep(WORKER_CHECK_INTERVAL)
+            for index, process in enumerate(self.workers):
+                if not process.is_alive():
+                    self.logger.warning('API worker stopped. Restarting...')
+                    self.workers[index] = spawn()
+
+    def register_metrics(self):
+        """
+        Exposes game and greenlet counts on /metrics, they are read only when scraped
+        """
+        games = METRICS.gauge('games', 'Open games by state', ('state',))
+        games.labels('running').set_function(
+            lambda: sum(1 for game in self.game_servers.values() if game.game_on and not game.game_paused)
+        )
+        games.labels('paused').set_function(
+            lambda: sum(1 for game in self.game_servers.values() if game.game_on and game.game_paused)
+        )
+        games.labels('idle').set_function(
+            lambda: sum(1 for game in self.game_servers.values() if not game.game_on)
+        )
+
+        servers = [server for arena in self.arenas.values() for server in arena.servers] + [self.expire_greenlet]
+        greenlets = METRICS.gauge('greenlets_active', 'Running greenlets by kind', ('kind',))
+        greenlets.labels('request').set_function(lambda: len(self.request_pool))
+        greenlets.labels('server').set_function(
+            lambda: sum(1 for server in servers if server.started and not server.dead)
+        )
+        greenlets.labels('game').set_function(
+            lambda: sum(1 for game in self.game_servers.values() if game.started and not game.dead)
+        )
+
+    def get_arena(self, name: Optional[str] = None) -> Arena:
+        """
+        Returns the arena with the given name, the first arena of the config if None
+        """
+        if name is None:
+            return next(iter(self.arenas.values()))
+        return self.arenas[name]
+
+    def create_game_server(self, teams: List[int], game_id=None, arena: Optional[str] = None,
+                           game_type: Optional[str] = None) -> GameServer:
+        arena = self.get_arena(arena)
+        game_type = self.game_types.get(game_type)
+        game_config = arena.game_config_for(game_type, self.game_types.markers())
+        new_game = game_type.game_class(arena.state_server, game_config, teams)
 
         if game_id is not None:
             new_game.id = game_id
 
-        self.server_queue.put(new_game.id)
-        self.game_servers[new_game.id] = new_game
-
-        # TODO: This needs to be changed.
-        if len(self.game_servers) >= 50:
-            self.game_servers.pop(self.server_queue.get())
+        self.game_servers.add(new_game)
+        arena.scheduler.add(new_game)
+        new_game.logger.info(
+            "\n\033[92mStarted a new game server with\nID: %s\nPASSWORD: %s\nARENA: %s\033[0m"
+            % (new_game.id, new_game.password, arena.name)
+        )
 
         return new_game
 
+    def remove_game_server(self, game_id: str) -> GameServer:
+        return self.game_servers.pop(game_id)
+
+    def release_game_server(self, game_server: GameServer):
+        """
+        Stops ticking a game that left the registry and tears it down
+        """
+        self.arenas[game_server.state_server.arena].scheduler.remove(game_server)
+        game_server.close()
+        if self.snapshots is not None:
+            self.snapshots.remove(game_server.id)
+            self._snapshot_reads.pop(game_server.id, None)
+
+    def expire_game_servers(self):
+        while True:
+            gevent.sleep(GAME_EXPIRE_INTERVAL)
+            self.game_servers.expire()
+
     def start_test_game_server(self) -> GameServer:
-        team_ids = list(self.game_config['robots'].keys())
+        team_ids = list(self.game_types.default.game_config['robots'].keys())
 
         test_game_server = self.create_game_server(team_ids[0:2], 'test')
         test_game_server.password = 'test'
@@ -86,6 +249,55 @@ def create_api(game_api: GameApi):
 
     game_ns = api.namespace('game', description='Game operations')
     team_ns = api.namespace('team', description='Team operations')
+    arena_ns = api.namespace('arena', description='Arena operations')
+    stats_ns = api.namespace('stats', description='Server statistics')
+
+    # Game state model of every game type, responses are documented with the model of the default type
+    game_models = game_api.game_types.to_models(api)
+    game_model = game_models[game_api.game_types.default.name]
+
+    requests_total = METRICS.counter('http_requests_total', 'Handled requests', ('route', 'method', 'status'))
+    request_seconds = METRICS.histogram('http_request_seconds', 'Time to handle a request', ('route', 'method'))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = timer()
+
+    @app.after_request
+    def record_request(response):
+        # Route templates keep the number of label values bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.labels(route, request.method).observe(timer() - g.request_started)
+        requests_total.labels(route, request.method, response.status_code).inc()
+
+        # Changes to games reach the API workers without waiting for the next frame
+        if game_api.snapshots is not None and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            game_api.publish_snapshots()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """
+        Metrics in the Prometheus text format
+        """
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+    def frame_headers(response: Response, frame: GameFrame, etag: bool = True) -> Response:
+        # Extrapolated bodies change with every response, the frame ETag would not identify them
+        if etag:
+            response.set_etag(frame.etag)
+        response.headers['X-Frame-Seq'] = str(frame.seq)
+        age = frame.age()
+        if age is not None:
+            # Seconds since the tracker captured the frame, when the response was built
+            response.headers['X-Frame-Age'] = '%.4f' % age
+        return response
+
+    def game_response(game_server: GameServer, extrapolate: bool = False) -> Response:
+        # Body and headers come from the frame published when the response is built
+        frame = game_server.frame
+        body = game_server.to_json_bytes(time.time() if extrapolate else None)
+        return frame_headers(Response(body, mimetype='application/json'), frame, not extrapolate)
 
     @auth.verify_password
     def verify_password(username, password):
@@ -98,21 +310,40 @@ def create_api(game_api: GameApi):
         @game_ns.expect(api.model('CreateGame', {
             'team_1': fields.Integer(required=True, description='Team 1 ID'),
             'team_2': fields.Integer(required=True, description='Team 2 ID'),
+            'arena': fields.String(required=False, description='Arena the game is played in, the first by default'),
+            'game_type': fields.String(
+                required=False, enum=list(game_models), description='Game type, the first one by default'
+            ),
         }))
         @game_ns.response(200, "Success", api.model('GameIdPassword', {
             'game_id': fields.String(required=True, description='Game ID'),
-            'password': fields.String(required=True, description='Game password')
+            'password': fields.String(required=True, description='Game password'),
+            'arena': fields.String(required=True, description='Arena the game is played in'),
+            'game_type': fields.String(required=True, description='Game type')
         }))
+        @game_ns.response(404, "Arena or game type not found")
         def post(self):
             """
             Create a new game
             """
+            arena = (api.payload or {}).get('arena')
+            if arena is not None and arena not in game_api.arenas:
+                api.abort(404, f"Arena {arena} doesn't exist")
+            game_type = (api.payload or {}).get('game_type')
+            if game_type is not None and game_type not in game_api.game_types:
+                api.abort(404, f"Game type {game_type} doesn't exist")
+
             try:
                 team_1 = int(api.payload['team_1'])
                 team_2 = int(api.payload['team_2'])
 
-                new_game = game_api.create_game_server([team_1, team_2])
-                return {'game_id': new_game.id, 'password': new_game.password}
+                new_game = game_api.create_game_server([team_1, team_2], arena=arena, game_type=game_type)
+                return {
+                    'game_id': new_game.id,
+                    'password': new_game.password,
+                    'arena': new_game.state_server.arena,
+                    'game_type': type(new_game).__name__.lower()
+                }
 
             except Exception as e:
                 api.abort(500, f"Unknown error occurred: {e}")
@@ -126,14 +357,14 @@ def create_api(game_api: GameApi):
             return jsonify(games)
 
         @auth.login_required()
-        @game_ns.response(204, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(204, "Success", game_model)
         def delete(self):
             """
             Delete a game
             """
             game_id = auth.username()
             if game_id in game_api.game_servers:
-                return game_api.game_servers.pop(game_id, None).to_json()
+                return game_response(game_api.remove_game_server(game_id))
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
@@ -141,16 +372,95 @@ def create_api(game_api: GameApi):
     @game_ns.response(404, 'Game not found')
     @game_ns.param('game_id', 'The game identifier')
     class Game(Resource):
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
+        @game_ns.response(304, "No new frame since the frame in If-None-Match")
+        @game_ns.param('after', 'Wait until there is a frame newer than this X-Frame-Seq', type=int)
+        @game_ns.param('timeout', f'Seconds to wait for a new frame, at most {LONG_POLL_TIMEOUT}', type=float)
+        @game_ns.param('extrapolate', 'Add positions extrapolated to the response time', type=bool)
         def get(self, game_id):
             """
             Fetch a game
             """
-            if game_id in game_api.game_servers:
-                return game_api.game_servers[game_id].to_json()
-            else:
+            if game_id not in game_api.game_servers:
+                api.abort(404, f"Game with id {game_id} doesn't exist")
+
+            game_server = game_api.game_servers[game_id]
+
+            after = request.args.get('after', type=int)
+            if after is not None:
+                timeout = wait_timeout(request.args.get('timeout', type=float), LONG_POLL_TIMEOUT)
+                game_server.wait_for_frame(after, timeout)
+
+            extrapolate = request.args.get('extrapolate', 'false').lower() in ('1', 'true', 'yes')
+            if not extrapolate and request.if_none_match.contains(game_server.etag()):
+                return frame_headers(Response(status=304), game_server.frame)
+
+            return game_response(game_server, extrapolate)
+
+    @game_ns.route('/<string:game_id>/stream')
+    @game_ns.response(404, 'Game not found')
+    @game_ns.param('game_id', 'The game identifier')
+    class GameStream(Resource):
+        @game_ns.response(200, "Server-sent events, one per frame")
+        def get(self, game_id):
+            """
+            Stream the game state as server-sent events
+            """
+            if game_id not in game_api.game_servers:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
+            stream = game_api.game_servers[game_id].stream
+            subscriber = stream.subscribe()
+
+            def events():
+                try:
+                    while True:
+                        message = subscriber.get(timeout=STREAM_KEEPALIVE)
+                        if subscriber.closed:
+                            break
+                        yield message if message is not None else b': keepalive\n\n'
+                finally:
+                    stream.unsubscribe(subscriber)
+
+            return Response(
+                events(),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+    @game_ns.route('/<string:game_id>/history')
+    @game_ns.response(404, 'Game not found')
+    @game_ns.param('game_id', 'The game identifier')
+    class GameHistory(Resource):
+        @game_ns.response(200, "Timestamps, positions and directions of every robot and object, oldest first",
+                          fields.Raw)
+        @game_ns.response(400, "Invalid query")
+        @game_ns.param('since', 'Start of the time range, seconds since the epoch', type=float)
+        @game_ns.param('until', 'End of the time range, seconds since the epoch', type=float)
+        @game_ns.param('ids', 'Comma separated robot and object ids of the game, all by default', type=str)
+        def get(self, game_id):
+            """
+            Fetch recent positions of robots and objects
+            """
+            if game_id not in game_api.game_servers:
+                api.abort(404, f"Game with id {game_id} doesn't exist")
+
+            try:
+                since = float(request.args.get('since', '-inf'))
+                until = float(request.args.get('until', 'inf'))
+                ids = request.args.get('ids')
+                ids = [int(key) for key in ids.split(',') if key] if ids is not None else None
+            except ValueError as e:
+                api.abort(400, f"Invalid query: {e}")
+
+            # The history of the arena also holds the markers of other game types
+            game_server = game_api.game_servers[game_id]
+            markers = game_server.markers()
+            ids = markers if ids is None else [key for key in ids if key in markers]
+            history = game_server.state_server.state.history.query(ids, since, until)
+            return Response(dump_json({str(key): columns for key, columns in history.items()}),
+                            mimetype='application/json')
+
     @game_ns.route('/score')
     @game_ns.response(404, 'Game not found')
     class GameScore(Resource):
@@ -160,7 +470,7 @@ def create_api(game_api: GameApi):
         })
 
         @game_ns.expect(alter_score_model)
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -173,7 +483,7 @@ def create_api(game_api: GameApi):
                     game_server.alter_score(api.payload)
                 except ApiError as e:
                     api.abort(e.status_code, e.message)
-                return game_server.to_json()
+                return game_response(game_server)
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
@@ -181,7 +491,7 @@ def create_api(game_api: GameApi):
     @game_ns.response(404, 'Game not found')
     class GameStart(Resource):
 
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -191,14 +501,14 @@ def create_api(game_api: GameApi):
             if game_id in game_api.game_servers:
                 game_server = game_api.game_servers[game_id]
                 game_server.start_game()
-                return game_server.to_json()
+                return game_response(game_server)
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
     @game_ns.route('/stop')
     @game_ns.response(404, 'Game not found')
     class GameStop(Resource):
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -208,7 +518,7 @@ def create_api(game_api: GameApi):
             if game_id in game_api.game_servers:
                 game_server = game_api.game_servers[game_id]
                 game_server.stop_game()
-                return game_server.to_json()
+                return game_response(game_server)
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
@@ -218,7 +528,7 @@ def create_api(game_api: GameApi):
         @game_ns.expect(api.model('SetTime', {
             'game_time': fields.Integer(required=True, description='Game time in seconds'),
         }))
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -228,7 +538,7 @@ def create_api(game_api: GameApi):
             if game_id in game_api.game_servers:
                 game_server = game_api.game_servers[game_id]
                 game_server.set_game_time(api.payload['game_time'])
-                return game_server.to_json()
+                return game_response(game_server)
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
@@ -239,7 +549,7 @@ def create_api(game_api: GameApi):
             'team_1': fields.Integer(required=True, description='Team 1 ID'),
             'team_2': fields.Integer(required=True, description='Team 2 ID'),
         }))
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -257,12 +567,12 @@ def create_api(game_api: GameApi):
                     api.abort(404, f"Team with id {team} doesn't exist")
 
             game_server.set_teams(teams)
-            return game_server.to_json()
+            return game_response(game_server)
 
     @game_ns.route('/pause')
     @game_ns.response(404, 'Game not found')
     class GamePause(Resource):
-        @game_ns.response(200, "Success", game_api.GameClass.to_model(api, game_api.game_config))
+        @game_ns.response(200, "Success", game_model)
         @auth.login_required()
         def put(self):
             """
@@ -276,7 +586,7 @@ def create_api(game_api: GameApi):
                 else:
                     game_server.pause_game()
 
-                return game_server.to_json()
+                return game_response(game_server)
             else:
                 api.abort(404, f"Game with id {game_id} doesn't exist")
 
@@ -313,4 +623,32 @@ def create_api(game_api: GameApi):
 
             return testItems
 
+    @arena_ns.route('/')
+    class Arenas(Resource):
+        @arena_ns.response(200, "Success", fields.List(fields.String))
+        def get(self):
+            """
+            List all arenas, the first one is used for games created without an arena
+            """
+            return jsonify(list(game_api.arenas.keys()))
+
+    @stats_ns.route('/')
+    class Stats(Resource):
+        @stats_ns.response(200, "Success", fields.Raw)
+        def get(self):
+            """
+            Get server statistics
+            """
+            return {
+                'arenas': {name: arena.stats() for name, arena in game_api.arenas.items()},
+                'registry': game_api.game_servers.stats(),
+                'logging': logging_stats(),
+                'workers': {
+                    'count': len(game_api.workers),
+                    'alive': sum(1 for process in game_api.workers if process.is_alive()),
+                    'snapshot_bytes': game_api.snapshots.nbytes if game_api.snapshots is not None else 0
+                },
+                'games': {game_id: game_server.stats() for game_id, game_server in game_api.game_servers.items()}
+            }
+
     return app
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import copy
+import os
+from typing import Dict, List, Optional, Set
+
+from sledilnik.TrackerGame import TrackerGame
+
+from src.classes.FrameLog import FrameReplay
+from src.classes.GameTypeRegistry import GameType
+from src.classes.SyntheticTracker import SyntheticTracker
+from src.servers.GameScheduler import GameScheduler
+from src.servers.ShardedScheduler import ShardedScheduler
+from src.servers.StateServer import StateServer
+from src.servers.TrackerServer import TrackerServer
+
+# Name of the arena used when the game config has no arenas section
+DEFAULT_ARENA = 'default'
+
+
+class Arena:
+    """One playing field with its own camera
+
+    Groups the tracker server, state server and game scheduler of a field. Every arena runs its tracker in its own
+    process, with its own tracker config, fields and robots, and games are bound to one arena when they are created.
+
+    Attributes:
+        name (str): Arena name
+        game_config (dict): Game config of the arena, the shared config with the overrides of the arena
+        overrides (dict): Keys of the game config set for this arena
+        tracker_server (TrackerServer): Tracker process babysitter
+        state_server (StateServer): Parsed state of the arena
+        scheduler (GameScheduler): Ticks the games bound to the arena, in shard processes if game_shards is set
+    """
+
+    def __init__(self, name: str, game_config: dict, tracker=None, record_path: Optional[str] = None,
+                 trace_path: Optional[str] = None, overrides: Optional[dict] = None):
+        self.name: str = name
+        self.game_config: dict = game_config
+        self.overrides: dict = overrides or {}
+        self._game_configs: Dict[str, dict] = {}
+
+        if tracker is None:
+            tracker = self.create_tracker(game_config)
+        self.tracker_server: TrackerServer = TrackerServer(game_config, tracker, record_path, trace_path, name)
+        self.state_server: StateServer = StateServer(self.tracker_server, game_config, name)
+        shards = game_config.get('game_shards', 0)
+        if shards > 0:
+            self.scheduler: GameScheduler = ShardedScheduler(self.state_server, game_config, shards)
+        else:
+            self.scheduler: GameScheduler = GameScheduler(self.state_server, game_config)
+
+    @staticmethod
+    def create_tracker(game_config: dict):
+        """
+        Creates the tracker set in the config of an arena
+        :param game_config: game config of the arena
+        :return: tracker, None for sledilnik's TrackerGame with the default tracker config
+        """
+        source = game_config.get('source', 'camera')
+        if source == 'synthetic':
+            return SyntheticTracker.from_config(game_config)
+        elif source == 'replay':
+            return FrameReplay(game_config['replay'], game_config.get('replay_speed', 1.0), loop=True)
+        elif source != 'camera':
+            raise ValueError(f'Unknown tracker source: {source}')
+
+        if 'tracker_config' in game_config:
+            return TrackerGame(game_config['tracker_config'])
+        return None
+
+    @classmethod
+    def from_config(cls, game_config: dict, tracker=None, record_path: Optional[str] = None,
+                    trace_path: Optional[str] = None) -> List['Arena']:
+        """
+        Creates the arenas listed in the arenas section of the game config, a single default arena without it
+        :param game_config: game config
+        :param tracker: tracker used instead of the camera by every arena whose section sets no source, copied for
+            each arena
+        :param record_path: frame log path, arenas record to their own file when there are several
+        :param trace_path: trace file path, arenas write their own file when there are several
+        :return: arenas in config order
+        """
+        sections: Dict[str, Optional[dict]] = game_config.get('arenas')
+        if not sections:
+            return [cls(DEFAULT_ARENA, game_config, tracker, record_path, trace_path)]
+        shared = {key: value for key, value in game_config.items() if key != 'arenas'}
+
+        arenas = []
+        for name, overrides in sections.items():
+            name = str(name)
+            # Trackers may add markers to the config, so every arena gets its own copy
+            arena_config = copy.deepcopy(shared)
+            arena_config.update(overrides or {})
+
+            # Arenas that set their own source keep it
+            arena_tracker = tracker
+            if tracker is not None and 'source' in (overrides or {}):
+                arena_tracker = None
+            elif tracker is not None and len(sections) > 1:
+                arena_tracker = copy.deepcopy(tracker)
+
+            arenas.append(cls(
+                name,
+                arena_config,
+                arena_tracker,
+                cls._arena_path(record_path, name, len(sections)),
+                cls._arena_path(trace_path, name, len(sections)),
+                overrides
+            ))
+        return arenas
+
+    @staticmethod
+    def _arena_path(path: Optional[str], name: str, count: int) -> Optional[str]:
+        if path is None or count == 1:
+            return path
+        base, extension = os.path.splitext(path)
+        return f'{base}-{name}{extension}'
+
+    def game_config_for(self, game_type: GameType, type_markers: Set[int]) -> dict:
+        """
+        Returns the config of games of a type played in this arena: the config of the type with the overrides of the
+        arena and the robots and objects of the type the tracker of the arena reports. Markers of the arena that no
+        type lists, like the ones a synthetic tracker added, are given to every type. Robots are named by the type,
+        unless the arena overrides the robots.
+        :param game_type: game type
+        :param type_markers: robot and object markers of all game types
+        """
+        game_config = self._game_configs.get(game_type.name)
+        if game_config is None:
+            game_config = dict(game_type.game_config)
+            game_config.update(self.overrides)
+            names = dict(game_type.game_config['robots'])
+            names.update(self.overrides.get('robots') or {})
+            game_config['robots'] = {
+                robot_id: names.get(robot_id, robot_name) for robot_id, robot_name in self.game_config['robots'].items()
+                if robot_id in game_type.game_config['robots'] or robot_id not in type_markers
+            }
+            game_config['objects'] = {
+                object_type: [
+                    object_id for object_id in self.game_config['objects'].get(object_type, object_ids)
+                    if object_id in object_ids or object_id not in type_markers
+                ]
+                for object_type, object_ids in game_type.game_config['objects'].items()
+            }
+            self._game_configs[game_type.name] = game_config
+        return game_config
+
+    def start(self):
+        self.tracker_server.start()
+        self.state_server.start()
+        self.scheduler.start()
+
+    @property
+    def servers(self) -> List:
+        return [self.tracker_server, self.state_server, self.scheduler]
+
+    def stats(self) -> Dict:
+        history = self.state_server.state.history
+        return {
+            'tracker': self.tracker_server.stats(),
+            'scheduler': self.scheduler.stats(),
+            'history': {
+                'markers': len(history.rows),
+                'bytes': history.nbytes
+            }
+        }
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from timeit import default_timer as timer
+from typing import Dict, List
+
+from src.servers.GameServer import GameServer
+from src.servers.Server import Server
+from src.servers.StateServer import StateServer
+from src.utils import create_logger
+
+# Weight of the newest tick in the per class moving average
+TICK_TIME_SMOOTHING = 0.1
+
+
+class GameScheduler(Server):
+    """Runs all game servers from one greenlet
+
+    On every state frame the scheduled games are ticked one after another, in the order they were added. Only running
+    games compute their game state, the others just take the new frame.
+
+    Attributes:
+        games (List[GameServer]): Scheduled games in tick order
+        tick_time (float): Duration of the last tick of all games in seconds
+        class_tick_time (Dict[str, float]): Moving average of the tick duration of each game class in seconds
+    """
+
+    def __init__(self, state_server: StateServer, game_config: Dict):
+        Server.__init__(self)
+        self.logger = create_logger('servers.GameScheduler', game_config['log_level'])
+
+        self.state_server: StateServer = state_server
+        self.games: List[GameServer] = []
+
+        self.tick_time: float = 0.0
+        self.class_tick_time: Dict[str, float] = {}
+
+    def add(self, game: GameServer):
+        if game not in self.games:
+            self.games.append(game)
+
+    def remove(self, game: GameServer):
+        if game in self.games:
+            self.games.remove(game)
+
+    def _run(self):
+        self.logger.info('Game scheduler started.')
+        seq = 0
+        while True:
+            seq = self.state_server.updated.wait(seq)
+            state_data = self.state_server.state
+
+            started = timer()
+            for game in list(self.games):
+                game_started = timer()
+                try:
+                    game.tick(state_data)
+                except Exception:
+                    self.logger.exception('Game %s failed to update' % game.id)
+                self.record_tick(game, timer() - game_started)
+            self.tick_time = timer() - started
+
+            self.finish_trace(state_data)
+            self.updated.publish()
+
+    def finish_trace(self, state_data):
+        """
+        Writes the trace of a frame the games are done with, if traces are recorded. The frames of the games are
+        encoded here instead of on the first request, so the trace has their serialize spans.
+        """
+        tracker = self.state_server.tracker
+        if state_data.trace is None or tracker is None or tracker.trace_recorder is None:
+            return
+        for game in self.games:
+            game.to_json_bytes()
+        tracker.trace_recorder.record(state_data.trace)
+
+    def record_tick(self, game: GameServer, duration: float):
+        game.tick_time = duration
+        game.tick_time_max = max(game.tick_time_max, duration)
+
+        # Idle games only take the frame, so they would hide a slow game class
+        if game.game_on and not game.game_paused:
+            name = type(game).__name__
+            average = self.class_tick_time.get(name, duration)
+            self.class_tick_time[name] = average + TICK_TIME_SMOOTHING * (duration - average)
+
+    def stats(self) -> Dict:
+        return {
+            'games': len(self.games),
+            'active_games': sum(1 for game in self.games if game.game_on and not game.game_paused),
+            'tick_time': self.tick_time,
+            'class_tick_time': self.class_tick_time
+        }
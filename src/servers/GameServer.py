@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 import logging
 import random
-from typing import Dict, List
+import time
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Set
 from uuid import uuid4
 
-import gevent
 from flask_restx import Api, fields
 
 from sledilnik.classes.Field import Field
 from sledilnik.classes.ObjectTracker import ObjectTracker
+from src.classes.GameFrame import GameFrame
+from src.classes.Metrics import FRAME_BUCKETS, METRICS
 from src.classes.StateLiveData import StateLiveData
+from src.classes.StreamHub import StreamHub
 from src.classes.Team import Team
 from src.classes.Timer import Timer
 from src.restapi.ApiError import ApiError
@@ -17,26 +21,45 @@ from src.servers.Server import Server
 from src.servers.StateServer import StateServer
 from random_username.generate import generate_username
 
-from src.utils import create_logger
+from src.utils import create_logger, dump_json
+
+UPDATE_SECONDS = METRICS.histogram(
+    'game_update_seconds', 'Time to update the game state of one game on a frame', ('game_class',), FRAME_BUCKETS
+)
+
+# Attributes that belong to the process running a game rather than to the game, they are not copied to game shards
+RUNTIME_ATTRIBUTES = frozenset({
+    'updated', 'logger', 'game_config', 'state_server', 'state_data', 'frame', '_etag_prefix', 'snapshot_hits',
+    'snapshot_misses', 'stream', 'tick_time', 'tick_time_max', '_update_seconds'
+})
 
 
 class GameServer(Server):
     """Game state for particular game
 
-    Pulls information from a state server and computers a game state.
+    Pulls information from a state server and computers a game state. Games are normally ticked by the
+    GameScheduler, starting the greenlet runs the game on its own instead.
 
     Attributes:
         id (UUID): Game id
         key (string): Key for write permissions
+        frame (GameFrame): State, scores and timer values of the newest frame, read by requests
+        snapshot_hits (int): Number of requests served from the encoded frame
+        snapshot_misses (int): Number of times a frame had to be encoded
+        stream (StreamHub): Subscribers that get the game state pushed on every frame
+        updated (FrameBroadcast): Published on every frame or state change, its sequence number identifies the snapshot
     """
 
     def __init__(self, state_server: StateServer, game_config: Dict, teams: List[int]):
         Server.__init__(self)
+        # Whatever the greenlet set so far is not part of the game either
+        self._runtime_attributes = RUNTIME_ATTRIBUTES.union(vars(self), ('_runtime_attributes',))
 
         self.logger = create_logger('servers.GameServer', game_config['log_level'])
         self.game_config = game_config
 
         self.state_server: StateServer = state_server
+        self.state_data: StateLiveData = state_server.state
         self.id: str = str(uuid4())[:4]
         self.password: str = generate_username(1)[0]
 
@@ -46,28 +69,59 @@ class GameServer(Server):
         self.game_time: int = game_config['game_time']
         self.timer = Timer()
 
+        # Published state, replaced after every frame or state change
+        self.frame: Optional[GameFrame] = None
+        self._etag_prefix: str = uuid4().hex[:8]
+        self.snapshot_hits: int = 0
+        self.snapshot_misses: int = 0
+
+        self.stream = StreamHub()
+
+        # Filled in by the GameScheduler
+        self.tick_time: float = 0.0
+        self.tick_time_max: float = 0.0
+        self._update_seconds = UPDATE_SECONDS.labels(type(self).__name__)
+
+        # set_teams publishes a snapshot, so the fields above have to exist
         self.teams: Dict[int, Team] = {}
         self.set_teams(teams)
 
     def _run(self):
         self.logger.info("\n\033[92mStarted a new game server with\nID: %s\nPASSWORD: %s\033[0m" % (self.id, self.password))
+        seq = 0
         while True:
             # Wait for state server to update state
-            self.state_server.updated.wait()
-            self.state_data: StateLiveData = self.state_server.state
+            seq = self.state_server.updated.wait(seq)
+            self.tick(self.state_server.state)
+
+    def tick(self, state_data: StateLiveData):
+        """
+        Advances the game to a new state frame
+        """
+        self.state_data = state_data
+
+        if self.game_on and not self.game_paused:
+            wall_started = time.time()
+            started = timer()
+            self.update_game_state()
+            elapsed = timer() - started
 
-            # print(self.id, self.gameData.gameOn)
-            if self.game_on and not self.game_paused:
-                self.update_game_state()
+            self._update_seconds.observe(elapsed)
+            if state_data.trace is not None:
+                state_data.trace.span('update_game_state', f'game {self.id}', wall_started, wall_started + elapsed)
 
-                # stop the game when no time left
-                if self.game_time_left() <= 0:
-                    self.stop_game()
+            # stop the game when no time left
+            if self.game_time_left() <= 0:
+                self.stop_game()
 
+        self.publish_frame()
 
-            self.updated.set()
-            gevent.sleep(0.01)
-            self.updated.clear()
+    def close(self):
+        """
+        Stops the game greenlet if it was started and disconnects stream subscribers
+        """
+        self.kill(block=False)
+        self.stream.close()
 
     def update_game_state(self):
         """
@@ -76,9 +130,22 @@ class GameServer(Server):
         for team in self.teams:
             team.score = random.randint(-100, 100)
 
+    def game_state(self) -> Dict:
+        """
+        Returns the attributes that make up the game, e.g. teams, timers and scores, so another process can continue it
+        """
+        return {key: value for key, value in vars(self).items() if key not in self._runtime_attributes}
+
+    def load_game_state(self, game_state: Dict):
+        """
+        Replaces the game with one returned by game_state, the published frame is left as it is
+        """
+        vars(self).update(game_state)
+
     def set_teams(self, teams: List[int]):
         colors = ['blue', 'red']
         self.teams = {team: self.init_team(team, color) for team, color in zip(teams, colors)}
+        self.publish_frame()
 
     def init_team(self, robot_id: int, color: str):
         if robot_id in self.game_config['robots']:
@@ -96,6 +163,7 @@ class GameServer(Server):
             else:
                 logging.error("Team with specified id is not part of the game!")
                 raise ApiError("Team with specified id is not part of the game!", 400)
+        self.publish_frame()
 
     def start_game(self):
         if not self.game_on:
@@ -107,44 +175,167 @@ class GameServer(Server):
             self.timer.start()
             self.game_on = True
             self.game_paused = False
+            self.publish_frame()
 
     def pause_game(self):
         if self.game_on and not self.game_paused:
             self.timer.pause()
             self.game_paused = True
+            self.publish_frame()
 
     def resume_game(self):
         if self.game_on and self.game_paused:
             self.timer.resume()
             self.game_paused = False
+            self.publish_frame()
 
     def stop_game(self):
         self.pause_game()
         self.game_on = False
+        self.publish_frame()
 
     def set_game_time(self, game_time: int):
         self.game_time = game_time
+        self.publish_frame()
 
     def game_time_left(self):
         return max(self.game_time - self.timer.get(), 0)
 
-    def to_json(self):
+    def to_json(self, at: Optional[float] = None):
+        """
+        Returns the state of the published frame. Robots and objects carry their velocity and, if at is given, their
+        position and direction extrapolated to that time. Only the robots, objects and fields of the game config are
+        listed, the state may also track those of other game types.
+        :param at: time to extrapolate positions to, seconds since the epoch
+        """
+        frame = self.frame
+        state = frame.state
+        robot_ids = self.game_config['robots']
+        object_ids = {object_type: set(ids) for object_type, ids in self.game_config['objects'].items()}
+        field_names = set(self.game_config['fields_names'])
+        velocities = state.motion_frame.to_json()
+        extrapolated = state.motion_frame.extrapolated_json(at) if at is not None else None
+
+        def object_json(obj: ObjectTracker) -> Dict:
+            result = obj.to_json()
+            result['velocity'] = velocities.get(obj.id)
+            if extrapolated is not None:
+                result['extrapolated'] = extrapolated.get(obj.id)
+            return result
+
         return {
             'id': self.id,
-            'game_on': self.game_on,
-            'game_paused': self.game_paused,
-            'time_left': self.game_time_left(),
-            'teams': {str(t.robot_id): t.to_json() for t in self.teams.values()},
-            'robots': {str(r.id): r.to_json() for r in self.state_data.robots.values()},
+            'game_on': frame.game_on,
+            'game_paused': frame.game_paused,
+            'time_left': frame.time_left,
+            'teams': frame.teams,
+            'robots': {str(r.id): object_json(r) for r in state.robots.values() if r.id in robot_ids},
             'objects': {
                 str(ot): {
-                    str(o.id): o.to_json() for o in self.state_data.objects[ot].values()
-                } for ot in self.state_data.objects
+                    str(o.id): object_json(o) for o in state.objects[ot].values() if o.id in object_ids[ot]
+                } for ot in state.objects if ot in object_ids
             },
-            'fields': {f_name: f.to_json() for f_name, f in self.state_data.fields.items()},
-            'timestamp': self.state_data.timestamp
+            'fields': {f_name: f.to_json() for f_name, f in state.fields.items() if f_name in field_names},
+            'timestamp': state.timestamp
         }
 
+    def publish_frame(self, encoded: Optional[bytes] = None):
+        """
+        Captures the game state in a new frame and swaps it in. Requests that already took the previous frame keep
+        using it, the new one is encoded on the first request. Every frame, including the ones published by state
+        changes between tracker frames, is pushed to stream subscribers.
+        :param encoded: the new frame already encoded, e.g. by a game shard
+        """
+        seq = self.updated.seq + 1
+        self.frame = GameFrame(
+            seq,
+            f'{self._etag_prefix}-{seq}',
+            self.state_data,
+            self.game_on,
+            self.game_paused,
+            self.game_time_left(),
+            {str(t.robot_id): t.to_json() for t in self.teams.values()}
+        )
+        self.frame.encoded = encoded
+        self.updated.publish()
+        if self.stream.subscribers:
+            self.stream.publish(self.to_json_bytes(), self.frame_seq)
+
+    @property
+    def frame_seq(self) -> int:
+        return self.frame.seq
+
+    def wait_for_frame(self, after: int, timeout: float) -> bool:
+        """
+        Blocks the calling greenlet until the frame sequence number is greater than after
+        :param after: last frame sequence number the caller has seen
+        :param timeout: maximum number of seconds to wait
+        :return: True if a newer frame exists
+        """
+        return self.updated.wait(after, timeout) > after
+
+    def frame_age(self) -> Optional[float]:
+        """
+        Returns seconds since the tracker captured the frame the game state is computed from
+        """
+        return self.frame.age()
+
+    def markers(self) -> Set[int]:
+        """
+        Returns the ids of the robots and objects of the game config
+        """
+        markers = set(self.game_config['robots'])
+        for object_ids in self.game_config['objects'].values():
+            markers.update(object_ids)
+        return markers
+
+    def etag(self) -> str:
+        return self.frame.etag
+
+    def to_json_bytes(self, at: Optional[float] = None) -> bytes:
+        """
+        Returns the published frame encoded as JSON. The encoding is done once per frame and shared between all
+        requests for it, except for states extrapolated to a given time.
+        """
+        if at is not None:
+            return dump_json(self.to_json(at))
+
+        frame = self.frame
+        if frame.encoded is None:
+            self.snapshot_misses += 1
+            started = time.time()
+            frame.encoded = dump_json(self.to_json())
+            if frame.state.trace is not None:
+                frame.state.trace.span('serialize', f'game {self.id}', started, time.time())
+        else:
+            self.snapshot_hits += 1
+        return frame.encoded
+
+    def stats(self) -> Dict:
+        return {
+            'arena': self.state_server.arena,
+            'game_type': type(self).__name__.lower(),
+            'snapshot_hits': self.snapshot_hits,
+            'snapshot_misses': self.snapshot_misses,
+            'stream_subscribers': len(self.stream.subscribers),
+            'tick_time': self.tick_time,
+            'tick_time_max': self.tick_time_max
+        }
+
+    @staticmethod
+    def object_model(api: Api):
+        motion = api.model('Motion', {
+            'x': fields.Float(description='X component'),
+            'y': fields.Float(description='Y component'),
+            'direction': fields.Float(description='Direction component, in degrees')
+        })
+        return api.clone('TrackedObject', ObjectTracker.to_model(api), {
+            'velocity': fields.Nested(motion, description='Velocity per second, smoothed over recent frames'),
+            'extrapolated': fields.Nested(
+                motion, required=False, description='Position and direction extrapolated to the response time'
+            )
+        })
+
     @classmethod
     def to_model(cls, api: Api, game_config: Dict):
         return api.model('GameServer', {
@@ -158,7 +349,7 @@ class GameServer(Server):
             ),
             'robots': fields.Nested(api.model(
                 'Robots',
-                {str(r): fields.Nested(ObjectTracker.to_model(api), required=False) for r in game_config['robots']})
+                {str(r): fields.Nested(cls.object_model(api), required=False) for r in game_config['robots']})
             ),
             'objects': fields.Nested(
                 api.model(
@@ -167,7 +358,7 @@ class GameServer(Server):
                         api.model(
                             'ObjectType',
                             {
-                                str(o): fields.Nested(ObjectTracker.to_model(api), required=False)
+                                str(o): fields.Nested(cls.object_model(api), required=False)
                                 for o in game_config['objects'][ot]
                             }
                         )
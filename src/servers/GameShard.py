@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import time
+from multiprocessing.connection import Connection
+from timeit import default_timer as timer
+from typing import Dict
+
+from src.classes.FrameRing import FrameRing
+from src.servers.GameServer import GameServer
+from src.servers.StateServer import StateServer
+from src.utils import create_logger
+
+
+class GameShard:
+    """Process that updates a share of the games
+
+    The ShardedScheduler sends a message per state frame with the sequence number of the tracker frame in the frame
+    ring, the capture time the core used for it, the games that changed in the core since the last frame and the games
+    that were removed. The shard parses the frame once, ticks all of its games and answers with the state and encoded
+    frame of every game that was running.
+
+    Messages are (ring_seq, timestamp, updates, removed), updates are (game_id, version, game_class, game_config,
+    game_state) with game_config None for games the shard already has. Answers are (ring_seq, started, done, results),
+    results are (game_id, version, game_state, encoded, tick_time).
+
+    Attributes:
+        connection (Connection): Pipe to the scheduler
+        ring (FrameRing): Tracker frames written by the scheduler
+        game_config (dict): Config of the state shared by the games of the arena
+        arena (str): Name of the arena
+    """
+
+    def __init__(self, connection: Connection, ring: FrameRing, game_config: dict, arena: str):
+        self.connection = connection
+        self.ring = ring
+        self.game_config = game_config
+        self.arena = arena
+
+    def run(self):
+        """
+        Ticks games until the scheduler closes the pipe, target of the shard process
+        """
+        logger = create_logger('servers.GameShard', self.game_config['log_level'])
+        logger.info('Game shard of arena %s started.' % self.arena)
+
+        state_server = StateServer(None, self.game_config, self.arena)
+        games: Dict[str, GameServer] = {}
+        versions: Dict[str, int] = {}
+
+        while True:
+            try:
+                ring_seq, timestamp, updates, removed = self.connection.recv()
+            except EOFError:
+                break
+            started = time.time()
+
+            for game_id in removed:
+                games.pop(game_id, None)
+                versions.pop(game_id, None)
+
+            for game_id, version, game_class, game_config, game_state in updates:
+                game = games.get(game_id)
+                if game is None:
+                    game = games[game_id] = game_class(state_server, game_config, list(game_state['teams']))
+                game.load_game_state(game_state)
+                versions[game_id] = version
+
+            results = []
+            data = self.ring.read(ring_seq)
+            if data is not None:
+                state_server.process(data, received=timestamp)
+                for game_id, game in games.items():
+                    running = game.game_on and not game.game_paused
+                    game_started = timer()
+                    try:
+                        game.tick(state_server.state)
+                    except Exception:
+                        logger.exception('Game %s failed to update' % game_id)
+                        continue
+                    if running:
+                        results.append((
+                            game_id, versions[game_id], game.game_state(), game.to_json_bytes(),
+                            timer() - game_started
+                        ))
+            else:
+                logger.warning('Frame %d was overwritten before it was read' % ring_seq)
+
+            self.connection.send((ring_seq, started, time.time(), results))
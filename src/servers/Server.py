@@ -1,17 +1,66 @@
 # -*- coding: utf-8 -*-
+from timeit import default_timer as timer
+from typing import Optional
 
 from gevent import Greenlet
 from gevent.event import Event
 
 
+class FrameBroadcast:
+    """Sequence-numbered notification of new frames
+
+    Every publish advances the sequence number and wakes every greenlet waiting at that moment exactly once. Waiters
+    pass the last sequence number they have seen, so a frame published while they were busy is not missed.
+
+    Attributes:
+        seq (int): Sequence number of the newest frame
+        published_at (float): Timer value of the newest publish
+    """
+
+    def __init__(self):
+        self.seq: int = 0
+        self.published_at: Optional[float] = None
+        # Created by the first waiter, so publishing without waiters does not allocate
+        self._event: Optional[Event] = None
+
+    def publish(self) -> int:
+        self.seq += 1
+        self.published_at = timer()
+
+        event, self._event = self._event, None
+        if event is not None:
+            event.set()
+        return self.seq
+
+    def wait(self, after: Optional[int] = None, timeout: Optional[float] = None) -> int:
+        """
+        Blocks the calling greenlet until a frame newer than after is published
+        :param after: last sequence number the caller has seen, by default waits for the next frame
+        :param timeout: maximum number of seconds to wait, None waits forever
+        :return: newest sequence number, not greater than after if the wait timed out
+        """
+        if after is None:
+            after = self.seq
+
+        deadline = timer() + timeout if timeout is not None else None
+        while self.seq <= after:
+            remaining = deadline - timer() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            if self._event is None:
+                self._event = Event()
+            self._event.wait(remaining)
+        return self.seq
+
+
 class Server(Greenlet):
     """Server that updates its information
 
-    Server updates its own information, then triggers the event to let other greenlets know,
+    Server updates its own information, then publishes a new frame to let other greenlets know,
 
     Attributes:
-        updated (Event): Event that fires when information is updated
+        updated (FrameBroadcast): Broadcast that fires when information is updated
     """
     def __init__(self):
         Greenlet.__init__(self)
-        self.updated = Event()
+        self.updated = FrameBroadcast()
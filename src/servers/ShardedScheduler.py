@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+import atexit
+from multiprocessing import get_context
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Set
+
+import gevent
+
+from src.classes.FrameRing import FrameRing
+from src.classes.Metrics import METRICS
+from src.classes.StateLiveData import StateLiveData
+from src.servers.GameScheduler import GameScheduler
+from src.servers.GameServer import GameServer
+from src.servers.GameShard import GameShard
+from src.servers.StateServer import StateServer
+
+# Frames kept in the ring, shards read the newest one while the scheduler waits for them
+SHARD_RING_SLOTS = 4
+# Seconds the scheduler waits for a shard to answer a frame
+SHARD_TICK_TIMEOUT = 1.0
+# Shards start with a fresh interpreter, without the hub and greenlets of this process. Everything shared with them,
+# including the write event of the frame ring, has to come from this context.
+SHARD_CONTEXT = get_context('spawn')
+
+
+class Shard:
+    """Game shard process as seen by the scheduler
+
+    Attributes:
+        index (int): Position of the shard in the pool
+        process: Shard process
+        connection (Connection): Pipe to the shard
+        games (Dict[str, GameServer]): Games updated by the shard
+        versions (Dict[str, int]): Version of the game state last sent to the shard, results of older versions are
+            dropped
+        synced (Dict[str, int]): Frame sequence number of every game when it matched the shard, games whose sequence
+            number moved on were changed by a request and are sent again
+        known (Set[str]): Games the shard process has, others are sent with their config
+        removed (List[str]): Games to remove from the shard with the next frame
+        busy (float): Seconds spent on frames since the utilization was last computed
+        utilization (float): Share of time the shard spent on frames
+        tick_time (float): Seconds the shard spent on the last frame
+    """
+
+    def __init__(self, index: int):
+        self.index: int = index
+        self.process = None
+        self.connection = None
+        self.games: Dict[str, GameServer] = {}
+        self.versions: Dict[str, int] = {}
+        self.synced: Dict[str, int] = {}
+        self.known: Set[str] = set()
+        self.removed: List[str] = []
+
+        self.busy: float = 0.0
+        self.utilization: float = 0.0
+        self.tick_time: float = 0.0
+
+    def start(self, ring: FrameRing, game_config: dict, arena: str):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection, child = SHARD_CONTEXT.Pipe()
+        shard = GameShard(child, ring, game_config, arena)
+        self.process = SHARD_CONTEXT.Process(target=shard.run, daemon=True)
+        self.process.start()
+        child.close()
+
+        # A new process has none of the games yet
+        self.known.clear()
+        self.synced.clear()
+        self.removed.clear()
+
+    def send(self, ring_seq: int, timestamp: float) -> bool:
+        """
+        Sends a frame with the games that changed since the last one
+        :return: False if the shard stopped
+        """
+        updates = []
+        for game_id, game in self.games.items():
+            if self.synced.get(game_id) == game.updated.seq:
+                continue
+            version = self.versions[game_id] = self.versions.get(game_id, 0) + 1
+            game_config = game.game_config if game_id not in self.known else None
+            updates.append((game_id, version, type(game), game_config, game.game_state()))
+            self.known.add(game_id)
+            self.synced[game_id] = game.updated.seq
+
+        try:
+            self.connection.send((ring_seq, timestamp, updates, self.removed))
+        except (BrokenPipeError, EOFError, OSError):
+            return False
+        self.removed = []
+        return True
+
+    def receive(self, ring_seq: int, timeout: float) -> Optional[tuple]:
+        """
+        Waits in a hub thread for the answer to a frame, answers to earlier frames are dropped
+        :return: (started, done, results) or None if the shard did not answer in time
+        """
+        deadline = timer() + timeout
+        while True:
+            remaining = deadline - timer()
+            if remaining <= 0 or not gevent.get_hub().threadpool.apply(self.connection.poll, (remaining,)):
+                return None
+            try:
+                seq, started, done, results = self.connection.recv()
+            except (EOFError, OSError):
+                return None
+            if seq == ring_seq:
+                return started, done, results
+
+    def stats(self) -> Dict:
+        return {
+            'games': len(self.games),
+            'active_games': sum(1 for game in self.games.values() if game.game_on and not game.game_paused),
+            'tick_time': self.tick_time,
+            'utilization': self.utilization,
+            'alive': self.process is not None and self.process.is_alive()
+        }
+
+
+class ShardedScheduler(GameScheduler):
+    """Runs the games of an arena in a pool of shard processes
+
+    Games are assigned to the shard with the fewest games when they are added. On every state frame the tracker frame
+    is written once to a shared memory FrameRing and every shard is told its sequence number, together with the state
+    of the games that requests changed since the last frame. Shards parse the frame, update their games in parallel
+    and answer with the state and encoded frame of every running game, which the scheduler loads into the games of
+    this process before publishing their frames. Requests keep working on the games here; their changes reach the
+    shard with the next frame, and answers computed from an older version of a game are dropped. Velocities in the
+    encoded frames are estimated by each shard from the frames it was sent.
+
+    Games that were not running take the frame here, like in the GameScheduler, and are encoded on request. The state
+    of a frame is held while the shards work on it and until the next frames are published, so the scores and the
+    state of a published frame always come from the same tracker frame.
+
+    Attributes:
+        ring (FrameRing): Tracker frames read by the shards
+        shards (List[Shard]): Shard processes
+    """
+
+    def __init__(self, state_server: StateServer, game_config: dict, shards: int):
+        GameScheduler.__init__(self, state_server, game_config)
+        self.game_config = game_config
+        self.arena: str = state_server.arena
+
+        # Every marker in the config has to fit, shards would not see the rest
+        markers = len(game_config['robots']) + sum(len(ids) for ids in game_config['objects'].values())
+        self.ring = FrameRing(
+            game_config['fields_names'],
+            SHARD_RING_SLOTS,
+            max(game_config.get('tracker_ring_max_objects', 64), markers),
+            written=SHARD_CONTEXT.Event()
+        )
+        atexit.register(self.ring.close)
+
+        self.shards: List[Shard] = [Shard(index) for index in range(shards)]
+        self._utilization_started: float = timer()
+        # State the published game frames point to, held until the next frames replace them
+        self._published: Optional[StateLiveData] = None
+
+        self.register_metrics()
+
+    def register_metrics(self):
+        """
+        Exposes the load of every shard on /metrics, it is read only when scraped
+        """
+        utilization = METRICS.gauge(
+            'game_shard_utilization', 'Share of time a game shard spends on frames', ('arena', 'shard')
+        )
+        games = METRICS.gauge('game_shard_games', 'Games assigned to a game shard', ('arena', 'shard'))
+        for shard in self.shards:
+            utilization.labels(self.arena, shard.index).set_function(lambda shard=shard: shard.utilization)
+            games.labels(self.arena, shard.index).set_function(lambda shard=shard: len(shard.games))
+
+    def add(self, game: GameServer):
+        if game in self.games:
+            return
+        GameScheduler.add(self, game)
+        min(self.shards, key=lambda shard: len(shard.games)).games[game.id] = game
+
+    def remove(self, game: GameServer):
+        GameScheduler.remove(self, game)
+        for shard in self.shards:
+            if shard.games.get(game.id) is game:
+                del shard.games[game.id]
+                shard.versions.pop(game.id, None)
+                shard.synced.pop(game.id, None)
+                if game.id in shard.known:
+                    shard.known.discard(game.id)
+                    shard.removed.append(game.id)
+
+    def _run(self):
+        for shard in self.shards:
+            shard.start(self.ring, self.game_config, self.arena)
+        self.logger.info('Sharded game scheduler started with %d shards.' % len(self.shards))
+
+        seq = 0
+        while True:
+            seq = self.state_server.updated.wait(seq)
+            # Waiting for the shards yields, the state server must not parse later frames into this state meanwhile
+            state_data = self.state_server.hold()
+
+            started = timer()
+            self.ring.put(state_data.tracker_data)
+            ring_seq = self.ring.head()
+
+            sent = []
+            for shard in self.shards:
+                if not shard.process.is_alive():
+                    self.logger.warning('Game shard %d stopped. Restarting...' % shard.index)
+                    shard.start(self.ring, self.game_config, self.arena)
+                sent.append(shard.send(ring_seq, state_data.captured))
+
+            for shard, was_sent in zip(self.shards, sent):
+                answer = shard.receive(ring_seq, SHARD_TICK_TIMEOUT) if was_sent else None
+                if answer is None:
+                    self.logger.warning('Game shard %d did not update its games in time' % shard.index)
+                    results = {}
+                else:
+                    shard_started, shard_done, results = answer
+                    results = {result[0]: result[1:] for result in results}
+                    shard.tick_time = shard_done - shard_started
+                    shard.busy += shard.tick_time
+                    if state_data.trace is not None:
+                        state_data.trace.span('update_games', f'shard {shard.index}', shard_started, shard_done)
+                self.apply(shard, state_data, results)
+            self.tick_time = timer() - started
+
+            if self._published is not None:
+                self.state_server.release(self._published)
+            self._published = state_data
+
+            self.update_utilization()
+            self.finish_trace(state_data)
+            self.updated.publish()
+
+    def apply(self, shard: Shard, state_data: StateLiveData, results: Dict[str, tuple]):
+        """
+        Publishes the frame of every game of a shard, with the state the shard computed if it is still current
+        :param shard: shard
+        :param state_data: state of the frame
+        :param results: (version, game state, encoded frame, tick time) by game id
+        """
+        for game_id, game in list(shard.games.items()):
+            synced = shard.synced.get(game_id) == game.updated.seq
+            result = results.get(game_id)
+
+            encoded = None
+            if synced and result is not None and result[0] == shard.versions.get(game_id):
+                _, game_state, encoded, tick_time = result
+                game.load_game_state(game_state)
+                self.record_tick(game, tick_time)
+
+            game.state_data = state_data
+            game.publish_frame(encoded)
+
+            # Changes requests made while the shard was busy are still sent with the next frame
+            if synced:
+                shard.synced[game_id] = game.updated.seq
+
+    def update_utilization(self):
+        elapsed = timer() - self._utilization_started
+        if elapsed >= 1.0:
+            for shard in self.shards:
+                shard.utilization = shard.busy / elapsed
+                shard.busy = 0.0
+            self._utilization_started = timer()
+
+    def stats(self) -> Dict:
+        result = GameScheduler.stats(self)
+        result['shards'] = [shard.stats() for shard in self.shards]
+        return result
@@ -1,42 +1,95 @@
 # -*- coding: utf-8 -*-import logging
 import logging
 import math
+import time
+from timeit import default_timer as timer
+from typing import Optional
 
-import gevent
 from sledilnik.classes import Point
+from sledilnik.classes.TrackerLiveData import TrackerLiveData
 
+from src.classes.FrameTrace import FrameTrace
+from src.classes.Metrics import FRAME_BUCKETS, METRICS
 from src.classes.StateLiveData import StateLiveData
 from src.servers.Server import Server
 from src.servers.TrackerServer import TrackerServer
 from src.utils import create_logger
 
+PARSE_SECONDS = METRICS.histogram(
+    'state_parse_seconds', 'Time to parse a tracker frame and compute object zones and velocities', ('arena',),
+    buckets=FRAME_BUCKETS
+)
+
 
 class StateServer(Server):
     """Server that stores abstract board information
 
-    Server pulls information from the tracker server and serves the abstract description of the game board.
+    Server pulls information from the tracker server and serves the abstract description of the game board. Frames
+    are double-buffered: the next frame is parsed into a second StateLiveData that then replaces state, so state is
+    never changed while it is published. A buffer is reused for the frame after the next one, readers that keep a
+    frame longer have to take the new state on every publish, like the game servers do, or hold it: a held buffer is
+    left alone and the next frame is parsed into a new one.
 
     Attributes:
         tracker: Tracker server
+        arena (str): Name of the arena of the tracker
     """
 
-    def __init__(self, tracker_server: TrackerServer, game_config: dict):
+    def __init__(self, tracker_server: TrackerServer, game_config: dict, arena: str = 'default'):
         Server.__init__(self)
+        self.arena: str = arena
+        self._parse_seconds = PARSE_SECONDS.labels(arena)
         self.logger = create_logger('servers.StateServer', game_config['log_level'])
         self.tracker: TrackerServer = tracker_server
+        self.game_config: dict = game_config
         self.state: StateLiveData = StateLiveData(game_config)
+        # Next frame is parsed here while readers use state
+        self._back: StateLiveData = StateLiveData(game_config, self.state.motion, self.state.history)
 
     def _run(self):
         self.logger.info('State server started.')
+        seq = 0
         while True:
-            self.tracker.updated.wait()
+            seq = self.tracker.updated.wait(seq)
+            self.process(self.tracker.state, self.tracker.trace)
+            self.updated.publish()
+
+    def process(self, data: TrackerLiveData, trace: Optional[FrameTrace] = None, received: Optional[float] = None):
+        """
+        Parses a tracker frame into the back buffer and swaps it with the published state
+        :param data: tracker frame
+        :param trace: stage timestamps of the frame
+        :param received: time the frame was received, by default from the trace or the current time
+        """
+        wall_started = time.time()
+        started = timer()
+        if received is None:
+            received = trace.received if trace is not None else wall_started
+        state = self._back
+        if state.holds:
+            state = self._back = StateLiveData(self.game_config, state.motion, state.history)
+        state.parse(data)
+        state.compute_zones()
+        state.trace = trace
+        state.compute_motion(state.frame_time(received))
+        elapsed = timer() - started
+
+        self._parse_seconds.observe(elapsed)
+        if trace is not None:
+            trace.span('parse', 'state', wall_started, wall_started + elapsed)
 
-            self.state.parse(self.tracker.state)
+        self._back, self.state = self.state, state
 
-            self.updated.set()
+    def hold(self) -> StateLiveData:
+        """
+        Returns the published state and keeps it from being reused for later frames until it is released
+        """
+        state = self.state
+        state.holds += 1
+        return state
 
-            gevent.sleep(0.01)
-            self.updated.clear()
+    def release(self, state: StateLiveData):
+        state.holds -= 1
 
     # def get_distance(self, p1: Point, p2: Point) -> float:
     #     """
@@ -1,50 +1,277 @@
 # -*- coding: utf-8 -*-
 
+import atexit
 import logging
+import time
+from datetime import datetime
 from multiprocessing import Process, Queue
+from queue import Empty
+from timeit import default_timer as timer
+from typing import Dict, Optional
 
 import gevent
+from gevent.threadpool import ThreadPool
 from sledilnik.TrackerGame import TrackerGame
 
+from src.classes.FrameCodec import encode_timestamp
+from src.classes.FrameLog import FrameRecorder
+from src.classes.FrameRing import FrameRing
+from src.classes.FrameTrace import FrameTrace, TraceRecorder
+from src.classes.Metrics import METRICS
+from src.classes.TrackerSource import TrackerSource
 from src.servers.Server import Server
 from src.utils import create_logger
 
+# Seconds a blocking read waits for a frame before checking that the tracker process is alive
+TRACKER_READ_TIMEOUT = 0.5
+
 
 class TrackerServer(Server):
     """Tracker process babysitter
 
-    Server spawns an external OpenCV tracker process and reads data from it.
+    Server spawns an external OpenCV tracker process and reads data from it. Frames are passed through a
+    multiprocessing.Queue or, with tracker_transport set to shared_memory, through a FrameRing. A TrackerSource, e.g.
+    a FrameReplay or a SyntheticTracker, can stand in for sledilnik's TrackerGame. Received frames can be recorded to
+    a frame log.
 
+    Attributes:
+        drain_queue (bool): Take all queued frames on each read and keep only the newest one
+        frames_received (int): Number of frames read from the tracker queue
+        frames_dropped (int): Number of frames skipped because a newer one was already queued
+        receive_rate (float): Frames per second read from the tracker queue
+        delivery_rate (float): Frames per second passed on to the state server
+        recorder (FrameRecorder): Records every received frame, if set, from its own thread so the hub does not wait
+            for the disk
+        trace (FrameTrace): Stage timestamps of the current frame
+        trace_recorder (TraceRecorder): Writes the trace of every frame the games were updated with, if set
+        arena (str): Name of the arena the tracker watches, labels its metrics
     """
 
-    def __init__(self, game_config: dict):
+    def __init__(self, game_config: dict, tracker=None, record_path: Optional[str] = None,
+                 trace_path: Optional[str] = None, arena: str = 'default'):
         Server.__init__(self)
+        self.arena: str = arena
 
         self.logger = create_logger('servers.TrackerServer', game_config['log_level'])
 
+        self.tracker = tracker if tracker is not None else TrackerGame()
+        if isinstance(self.tracker, TrackerSource):
+            self.tracker.prepare(game_config)
+
         self.state = None
         self.queue = Queue()
+        self.drain_queue: bool = game_config.get('tracker_drain_queue', True)
+
+        self.ring: Optional[FrameRing] = None
+        self.ring_seq: int = 0
+        if game_config.get('tracker_transport', 'queue') == 'shared_memory':
+            # Every marker in the config has to fit, including the ones the source added
+            markers = len(game_config['robots']) + sum(len(ids) for ids in game_config['objects'].values())
+            self.ring = FrameRing(
+                game_config['fields_names'],
+                game_config.get('tracker_ring_slots', 8),
+                max(game_config.get('tracker_ring_max_objects', 64), markers)
+            )
+            atexit.register(self.ring.close)
+
+        self.frames_received: int = 0
+        self.frames_dropped: int = 0
+        self.frames_delivered: int = 0
+        self.receive_rate: float = 0.0
+        self.delivery_rate: float = 0.0
+        self.received_at: Optional[float] = None
+        self._rate_started: float = timer()
+        self._rate_received: int = 0
+        self._rate_delivered: int = 0
+
+        self.recorder: Optional[FrameRecorder] = None
+        # One thread, so frames are written in the order they were received
+        self._record_pool: Optional[ThreadPool] = None
+        if record_path is not None:
+            self.recorder = FrameRecorder(record_path, game_config['fields_names'])
+            self._record_pool = ThreadPool(1)
+            atexit.register(self._close_recorder)
+            self.logger.info("Recording tracker frames to %s" % record_path)
+
+        self.trace: Optional[FrameTrace] = None
+        self.trace_recorder: Optional[TraceRecorder] = None
+        if trace_path is not None:
+            self.trace_recorder = TraceRecorder(trace_path)
+            atexit.register(self.trace_recorder.close)
+            self.logger.info("Writing frame traces to %s" % trace_path)
 
-        self.tracker = TrackerGame()
+        self.p = Process(target=self.tracker.start, args=(self.channel(),))
 
-        self.p = Process(target=self.tracker.start, args=(self.queue,))
+        self.register_metrics()
+
+    def register_metrics(self):
+        """
+        Exposes the counters of this server on /metrics, they are read only when scraped
+        """
+        labels = ('arena',)
+        METRICS.gauge('tracker_frame_rate', 'Frames per second read from the tracker', labels) \
+            .labels(self.arena).set_function(lambda: self.receive_rate)
+        METRICS.gauge('tracker_delivery_rate', 'Frames per second passed on to the state server', labels) \
+            .labels(self.arena).set_function(lambda: self.delivery_rate)
+        METRICS.gauge('tracker_queue_depth', 'Frames waiting in the tracker queue', labels) \
+            .labels(self.arena).set_function(self.queue_depth)
+        METRICS.gauge('tracker_frame_age_seconds', 'Seconds since the tracker captured the current frame', labels) \
+            .labels(self.arena).set_function(self.frame_age)
+        METRICS.counter('tracker_frames_received_total', 'Frames read from the tracker', labels) \
+            .labels(self.arena).set_function(lambda: self.frames_received)
+        METRICS.counter('tracker_frames_dropped_total', 'Frames skipped because a newer one was already queued',
+                        labels).labels(self.arena).set_function(lambda: self.frames_dropped)
+        if self.ring is not None:
+            METRICS.counter('tracker_frames_truncated_total', 'Frames with more markers than the ring holds', labels) \
+                .labels(self.arena).set_function(lambda: self.ring.truncated)
+
+    def channel(self):
+        """
+        Returns the object the tracker process puts frames into
+        """
+        return self.ring if self.ring is not None else self.queue
 
     def _run(self):
         # Start tracker in another process and open message queue
         self.p.start()
-        self.logger.info("Tracker server started.")
+        self.logger.info("Tracker server of arena %s started." % self.arena)
 
         while True:
             # Update state from tracker
 
             if not self.p.is_alive():
                 self.logger.warning("Tracker stopped. Restarting...")
-                self.p = Process(target=self.tracker.start, args=(self.queue,))
+                self.p = Process(target=self.tracker.start, args=(self.channel(),))
                 self.p.start()
 
-            if not self.queue.empty():
-                self.state = self.queue.get()
-                self.updated.set()
+            state, received = self._receive()
+            if state is not None:
+                self.state = state
+                self.received_at = timer()
+                self.frames_received += received
+                self.frames_dropped += received - 1
+                self.frames_delivered += 1
+                self._trace(state)
+                self.updated.publish()
+
+            self._update_rates(received)
+
+    def _receive(self):
+        """
+        Waits for the next frame in a hub thread, so other greenlets keep running. In drain mode all queued frames
+        are read and only the newest is kept.
+        :return: newest frame or None and the number of frames read
+        """
+        if self.ring is not None:
+            if self.ring.head() <= self.ring_seq:
+                gevent.get_hub().threadpool.apply(self.ring.wait, (TRACKER_READ_TIMEOUT,))
+            return self._receive_ring()
+
+        try:
+            state = gevent.get_hub().threadpool.apply(self.queue.get, (True, TRACKER_READ_TIMEOUT))
+        except Empty:
+            return None, 0
+        self._record(state)
+
+        received = 1
+        while self.drain_queue:
+            try:
+                state = self.queue.get_nowait()
+            except Empty:
+                break
+            self._record(state)
+            received += 1
+        return state, received
+
+    def _receive_ring(self):
+        """
+        Reads the shared memory ring. In drain mode the newest frame is read, otherwise the next one that is still
+        in the ring. Frames skipped in drain mode are still recorded, if they were not overwritten yet.
+        :return: frame or None and the number of frames since the last read
+        """
+        for _ in range(3):
+            head = self.ring.head()
+            if head <= self.ring_seq:
+                return None, 0
+
+            oldest = max(self.ring_seq + 1, head - self.ring.slots + 1)
+            seq = head if self.drain_queue else oldest
+            state = self.ring.read(seq)
+            if state is not None:
+                if self.recorder is not None:
+                    for skipped in range(oldest, seq):
+                        skipped_state = self.ring.read(skipped)
+                        if skipped_state is not None:
+                            self._record(skipped_state)
+                self._record(state)
+                received = seq - self.ring_seq
+                self.ring_seq = seq
+                return state, received
+
+        # Writer keeps overwriting the slot we are reading, try again on the next frame
+        return None, 0
+
+    def _trace(self, state):
+        # Written by the game scheduler once the games are done with the frame
+        self.trace = FrameTrace(self.frames_delivered, encode_timestamp(state.timestamp), time.time())
+
+    def _record(self, state):
+        if self.recorder is not None:
+            self._record_pool.spawn(self.recorder.record, state, time.time())
+
+    def _close_recorder(self):
+        self._record_pool.join()
+        self.recorder.close()
+
+    def _update_rates(self, received: int):
+        self._rate_received += received
+        self._rate_delivered += 1 if received else 0
+
+        elapsed = timer() - self._rate_started
+        if elapsed >= 1.0:
+            self.receive_rate = self._rate_received / elapsed
+            self.delivery_rate = self._rate_delivered / elapsed
+            self._rate_started = timer()
+            self._rate_received = 0
+            self._rate_delivered = 0
+
+    def queue_depth(self) -> Optional[int]:
+        if self.ring is not None:
+            return self.ring.head() - self.ring_seq
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:
+            # Not available on macOS
+            return None
+
+    def frame_age(self) -> Optional[float]:
+        """
+        Returns seconds since the tracker captured the current frame
+        """
+        if self.state is None:
+            return None
+
+        timestamp = self.state.timestamp
+        if isinstance(timestamp, datetime):
+            return (datetime.now(timestamp.tzinfo) - timestamp).total_seconds()
+        elif isinstance(timestamp, (int, float)):
+            return time.time() - timestamp
+        else:
+            return None
 
-            gevent.sleep(0.01)
-            self.updated.clear()
+    def stats(self) -> Dict:
+        return {
+            'transport': 'shared_memory' if self.ring is not None else 'queue',
+            'drain_queue': self.drain_queue,
+            'queue_depth': self.queue_depth(),
+            'frame_age': self.frame_age(),
+            'since_last_frame': timer() - self.received_at if self.received_at is not None else None,
+            'frames_received': self.frames_received,
+            'frames_dropped': self.frames_dropped,
+            'frames_truncated': self.ring.truncated if self.ring is not None else None,
+            'frames_delivered': self.frames_delivered,
+            'receive_rate': self.receive_rate,
+            'delivery_rate': self.delivery_rate,
+            'frames_recorded': self.recorder.frames if self.recorder is not None else None,
+            'frames_traced': self.trace_recorder.frames if self.trace_recorder is not None else None
+        }
@@ -1,5 +1,15 @@
-import yaml
+import atexit
 import logging
+import math
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import resource_tracker, shared_memory
+from queue import SimpleQueue
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+import yaml
 
 from shapely.geometry import Point as SPoint
 from shapely.geometry.polygon import Polygon as SPolygon
@@ -25,6 +35,30 @@ def check_if_object_in_area(object_pos: Point, field: Field):
     return polygon.contains(point)
 
 
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Opens a shared memory segment created by another process, without handing it to the resource tracker of this
+    process, which would unlink it when this process exits
+    :param name: segment name
+    :return: segment
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def unlink_shared_memory(shm: shared_memory.SharedMemory):
+    """
+    Removes a segment this process created. Processes that attached to it with attach_shared_memory may have
+    unregistered it from a resource tracker they share with this process, so it is registered again first and the
+    tracker does not complain about the unlink.
+    """
+    resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
 def read_config(config_path):
     """
     Reads config file
@@ -35,26 +69,140 @@ def read_config(config_path):
         return yaml.safe_load(f)
 
 
-def create_logger(name: str, log_level: str) -> logging.Logger:
-    # create a logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.getLevelName(log_level))
+def dump_json(data) -> bytes:
+    """
+    Serializes data to JSON with orjson.
+    :param data: JSON compatible data (dicts, lists, numbers, strings, numpy values)
+    :return: encoded JSON bytes
+    """
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def wait_timeout(timeout: Optional[float], maximum: float) -> float:
+    """
+    Clamps the timeout a request asked to wait for a frame
+    :param timeout: requested seconds, None if not given or not a number
+    :param maximum: longest allowed wait, also used for missing and non-finite timeouts
+    :return: seconds between 0 and maximum
+    """
+    if timeout is None or not math.isfinite(timeout):
+        return maximum
+    return min(max(timeout, 0.0), maximum)
+
+
+class RateLimitFilter(logging.Filter):
+    """Rate limit for hot path logs
+
+    Lets at most rate records per second through for every message of the given level or lower, the rest are
+    counted and dropped.
+    """
+
+    def __init__(self, rate: float, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+        self.suppressed = 0
+        self._windows: Dict[Tuple[str, str], List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+
+        now = record.created
+        window = self._windows.get((record.name, str(record.msg)))
+        if window is None or now - window[0] >= 1.0:
+            self._windows[(record.name, str(record.msg))] = [now, 1]
+            return True
+        if window[1] < self.rate:
+            window[1] += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+
+class TimedQueueHandler(QueueHandler):
+    """Queue handler that measures how long logging blocks the caller"""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.records = 0
+        self.emit_time = 0.0
+        self.emit_time_max = 0.0
+
+    def emit(self, record: logging.LogRecord):
+        started = timer()
+        super().emit(record)
+        elapsed = timer() - started
+
+        self.records += 1
+        self.emit_time += elapsed
+        self.emit_time_max = max(self.emit_time_max, elapsed)
 
-    # create a file handler
-    file_handler = logging.FileHandler('game-server.log')
-    file_handler.setLevel(log_level)
 
-    # create a console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
+_log_handler: Optional[TimedQueueHandler] = None
+_log_filter: Optional[RateLimitFilter] = None
+_log_listener: Optional[QueueListener] = None
 
-    # create formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
 
-    # add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+def setup_logging(debug_rate_limit: Optional[float] = None, log_path: str = 'game-server.log'):
+    """
+    Sets up the process wide log pipeline: loggers put records in a queue and a background thread writes them to
+    the log file and the console. The pipeline is set up once, by the first call or the first create_logger; later
+    calls only apply their debug rate limit.
+    :param debug_rate_limit: maximum number of debug records per second for every message, None keeps the current
+        limit, no limit if none was set
+    :param log_path: path to the log file, used by the call that sets the pipeline up
+    """
+    global _log_handler, _log_filter, _log_listener
+    if _log_handler is None:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+        file_handler = logging.FileHandler(log_path)
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        log_queue = SimpleQueue()
+        _log_handler = TimedQueueHandler(log_queue)
+
+        _log_listener = QueueListener(log_queue, file_handler, console_handler)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+
+    if debug_rate_limit is not None:
+        if _log_filter is None:
+            _log_filter = RateLimitFilter(debug_rate_limit)
+            _log_handler.addFilter(_log_filter)
+        else:
+            _log_filter.rate = debug_rate_limit
+
+
+def logging_stats() -> Dict:
+    if _log_handler is None:
+        return {}
+    return {
+        'records': _log_handler.records,
+        'suppressed': _log_filter.suppressed if _log_filter is not None else 0,
+        'queued': _log_handler.queue.qsize(),
+        'emit_time_mean': _log_handler.emit_time / _log_handler.records if _log_handler.records else 0.0,
+        'emit_time_max': _log_handler.emit_time_max
+    }
+
+
+def create_logger(name: str, log_level: str) -> logging.Logger:
+    """
+    Returns a logger that writes through the shared log pipeline. Handlers are attached only once per logger, so
+    calling it again for the same name is cheap.
+    :param name: logger name
+    :param log_level: level name, e.g. 'DEBUG'
+    :return: logger
+    """
+    setup_logging()
+
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.getLevelName(log_level))
+    if _log_handler not in logger.handlers:
+        logger.addHandler(_log_handler)
 
     return logger
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Field membership of points on and around field boundaries, through FieldIndex and StateLiveData.in_field, compared
+with the per point check_if_object_in_area. Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('shapely')
+pytest.importorskip('sledilnik')
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.ObjectTracker import ObjectTracker
+from sledilnik.classes.Point import Point
+
+from src.classes.FieldIndex import FieldIndex
+from src.classes.FrameCodec import make_frame
+from src.classes.StateLiveData import StateLiveData
+from src.utils import check_if_object_in_area
+
+
+def square(x: float, y: float, size: float) -> Field:
+    return Field(Point(x, y + size), Point(x + size, y + size), Point(x + size, y), Point(x, y))
+
+
+# Corners, edges, just inside and just outside of a 100 x 100 square at (100, 100)
+POINTS = [
+    (150, 150),
+    (100, 100), (200, 200), (100, 200), (200, 100),
+    (100, 150), (200, 150), (150, 100), (150, 200),
+    (100.001, 150), (199.999, 150), (150, 100.001), (150, 199.999),
+    (99.999, 150), (200.001, 150), (150, 99.999), (150, 200.001),
+    (0, 0), (-150, -150),
+]
+FIELDS = {
+    'square': square(100, 100, 100),
+    # Tilted field, its edges are not parallel to the axes
+    'diamond': Field(Point(150, 250), Point(250, 150), Point(150, 50), Point(50, 150)),
+}
+
+
+def test_contains_matches_the_per_point_check():
+    index = FieldIndex()
+    index.update(FIELDS)
+    contains = index.contains(np.array(POINTS, dtype=float))
+
+    assert contains.shape == (len(POINTS), len(FIELDS))
+    for row, (x, y) in enumerate(POINTS):
+        for name, field in FIELDS.items():
+            expected = check_if_object_in_area(Point(x, y), field)
+            assert contains[row, index.columns[name]] == expected, (x, y, name)
+            assert index.contains_point(Point(x, y), name) == expected, (x, y, name)
+
+
+def test_boundary_points_are_outside():
+    index = FieldIndex()
+    index.update({'square': square(100, 100, 100)})
+    contains = index.contains(np.array([(150, 150), (100, 150), (200, 200), (100.001, 150)], dtype=float))
+
+    assert contains[:, 0].tolist() == [True, False, False, True]
+
+
+def test_moved_and_removed_fields():
+    index = FieldIndex()
+    index.update({'a': square(0, 0, 10), 'b': square(100, 100, 10)})
+    assert index.contains_point(Point(5, 5), 'a')
+
+    index.update({'a': square(50, 50, 10)})
+    assert index.names == ['a']
+    assert not index.contains_point(Point(5, 5), 'a')
+    assert index.contains_point(Point(55, 55), 'a')
+    assert not index.contains_point(Point(105, 105), 'b')
+
+
+def test_no_points_or_no_fields():
+    index = FieldIndex()
+    assert index.contains(np.zeros((3, 2))).shape == (3, 0)
+    index.update(FIELDS)
+    assert index.contains(np.zeros((0, 2))).shape == (0, 2)
+
+
+def test_in_field():
+    config = {'robots': {1: 'Robot'}, 'objects': {'ball': [2, 3]}, 'fields_names': ['square']}
+    state = StateLiveData(config)
+    objects = {
+        1: ObjectTracker(1, Point(150, 150), 0.0),
+        2: ObjectTracker(2, Point(100, 150), 0.0),
+        3: ObjectTracker(3, Point(99.999, 150), 0.0),
+        # Not in the config
+        4: ObjectTracker(4, Point(150, 150), 0.0),
+    }
+    state.parse(make_frame(1.0, objects, {'square': square(100, 100, 100)}))
+    state.compute_zones()
+
+    assert state.in_field(1, 'square')
+    assert not state.in_field(2, 'square')
+    assert not state.in_field(3, 'square')
+    assert not state.in_field(4, 'square')
+    assert not state.in_field(1, 'unknown')
+
+    # The robot leaves the field in the next frame
+    objects[1] = ObjectTracker(1, Point(200, 150), 0.0)
+    state.parse(make_frame(2.0, objects, {'square': square(100, 100, 100)}))
+    state.compute_zones()
+    assert not state.in_field(1, 'square')
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Frame log round trip: frames recorded with FrameRecorder read back the same through FrameLog, also when the last
+record was not written completely. Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('sledilnik')
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.ObjectTracker import ObjectTracker
+from sledilnik.classes.Point import Point
+
+from src.classes import FrameLog as frame_log_module
+from src.classes.FrameCodec import make_frame
+from src.classes.FrameLog import FrameLog, FrameRecorder, FrameReplay, index_path
+
+FIELD_NAMES = ['arena', 'base']
+
+
+def field(x: float, y: float, size: float) -> Field:
+    return Field(Point(x, y + size), Point(x + size, y + size), Point(x + size, y), Point(x, y))
+
+
+def frame(timestamp: float, count: int, base_x: float):
+    objects = {
+        oid: ObjectTracker(oid, Point(10.0 * oid + timestamp, 20.0 * oid), (30.0 * oid) % 360)
+        for oid in range(count)
+    }
+    return make_frame(timestamp, objects, {'arena': field(0, 0, 1000), 'base': field(base_x, 100, 50)})
+
+
+def record(path, frames):
+    recorder = FrameRecorder(str(path), FIELD_NAMES)
+    for data in frames:
+        recorder.record(data, data.timestamp + 0.01)
+    recorder.close()
+
+
+def assert_same(read, data):
+    assert read.timestamp == pytest.approx(data.timestamp)
+    assert sorted(read.objects) == sorted(data.objects)
+    for oid, obj in data.objects.items():
+        assert read.objects[oid].position.to_tuple() == pytest.approx(obj.position.to_tuple())
+        assert read.objects[oid].direction == pytest.approx(obj.direction)
+    assert sorted(read.fields) == sorted(data.fields)
+    for name, expected in data.fields.items():
+        assert read.fields[name].to_tuple() == expected.to_tuple()
+
+
+def test_round_trip(tmp_path):
+    # The base field moves once, later records point back to the fields of an earlier one
+    frames = [frame(100.0 + i, 3 + i % 2, 100 if i < 2 else 300) for i in range(5)]
+    path = tmp_path / 'match.frames'
+    record(path, frames)
+
+    frame_log = FrameLog(str(path))
+    assert frame_log.field_names == FIELD_NAMES
+    assert len(frame_log) == len(frames)
+    for position, data in enumerate(frames):
+        assert_same(frame_log.read(position), data)
+        assert frame_log.received(position) == pytest.approx(data.timestamp + 0.01)
+    assert frame_log.seek(102.0) == 2
+    assert frame_log.seek(200.0) == len(frames)
+
+
+def test_incomplete_last_record_is_ignored(tmp_path):
+    frames = [frame(100.0 + i, 4, 100) for i in range(3)]
+    path = tmp_path / 'match.frames'
+    record(path, frames)
+
+    # The index was flushed, but the last record only partly
+    with open(path, 'r+b') as log:
+        log.truncate(path.stat().st_size - 5)
+    frame_log = FrameLog(str(path))
+    assert len(frame_log) == 2
+    for position in range(2):
+        assert_same(frame_log.read(position), frames[position])
+
+
+def test_index_past_the_end_of_the_log_is_ignored(tmp_path):
+    frames = [frame(100.0 + i, 2, 100) for i in range(3)]
+    path = tmp_path / 'match.frames'
+    record(path, frames)
+
+    # Only the header of the last record made it to the log
+    with open(index_path(str(path)), 'rb') as index:
+        entries = index.read()
+    last_offset = int.from_bytes(entries[-24:-16], 'little')
+    with open(path, 'r+b') as log:
+        log.truncate(last_offset + 4)
+    assert len(FrameLog(str(path))) == 2
+
+    # No record at all
+    with open(path, 'r+b') as log:
+        log.truncate(last_offset)
+    assert len(FrameLog(str(path))) == 2
+
+
+class Idle(Exception):
+    pass
+
+
+class Sent(list):
+    """Stands in for the tracker queue"""
+    put = list.append
+
+
+def test_replay_of_empty_log_does_not_spin(tmp_path, monkeypatch):
+    path = tmp_path / 'empty.frames'
+    record(path, [])
+
+    def sleep(seconds):
+        raise Idle()
+
+    monkeypatch.setattr(frame_log_module.time, 'sleep', sleep)
+    sent = Sent()
+    with pytest.raises(Idle):
+        FrameReplay(str(path), speed=0, loop=True).start(sent)
+    assert sent == []
+
+
+def test_replay_past_the_end_does_not_spin(tmp_path, monkeypatch):
+    path = tmp_path / 'match.frames'
+    record(path, [frame(100.0, 2, 100)])
+
+    def sleep(seconds):
+        raise Idle()
+
+    monkeypatch.setattr(frame_log_module.time, 'sleep', sleep)
+    sent = Sent()
+    with pytest.raises(Idle):
+        FrameReplay(str(path), speed=0, loop=True, start=500.0).start(sent)
+    assert sent == []
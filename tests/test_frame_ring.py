@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Edge cases of the shared memory frame ring: overwritten slots, torn reads and truncated frames. Run from the
+repository root:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('sledilnik')
+
+from sledilnik.classes.Field import Field
+from sledilnik.classes.ObjectTracker import ObjectTracker
+from sledilnik.classes.Point import Point
+
+from src.classes.FrameCodec import make_frame
+from src.classes.FrameRing import FrameRing
+
+FIELD_NAMES = ['arena']
+
+
+def frame(timestamp: float, count: int = 2):
+    objects = {oid: ObjectTracker(oid, Point(float(oid), timestamp), 90.0) for oid in range(count)}
+    return make_frame(timestamp, objects, {'arena': Field(Point(0, 10), Point(10, 10), Point(10, 0), Point(0, 0))})
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(FIELD_NAMES, slots=4, max_objects=3)
+    yield ring
+    ring.close()
+
+
+def test_reads_frames_in_the_ring(ring):
+    assert ring.head() == 0
+    assert ring.read(1) is None
+
+    for seq in range(1, 4):
+        ring.put(frame(float(seq)))
+    assert ring.head() == 3
+    for seq in range(1, 4):
+        data = ring.read(seq)
+        assert data.timestamp == seq
+        assert sorted(data.objects) == [0, 1]
+        assert data.objects[1].position.to_tuple() == (1.0, float(seq))
+        assert data.fields['arena'].to_tuple() == ((0, 10), (10, 10), (10, 0), (0, 0))
+
+
+def test_overwritten_frames_are_gone(ring):
+    for seq in range(1, 7):
+        ring.put(frame(float(seq)))
+
+    # Four slots keep frames 3 to 6
+    assert ring.head() == 6
+    assert ring.read(1) is None
+    assert ring.read(2) is None
+    assert [ring.read(seq).timestamp for seq in range(3, 7)] == [3.0, 4.0, 5.0, 6.0]
+    assert ring.read(7) is None
+
+
+def test_slot_being_written_is_not_read(ring):
+    ring.put(frame(1.0))
+    ring.ring['seq'][1 % ring.slots] = 0
+    assert ring.read(1) is None
+
+
+def test_slot_overwritten_while_reading_is_dropped(ring, monkeypatch):
+    ring.put(frame(1.0))
+    decode = ring._field_decoder.decode
+
+    def overwrite_then_decode(records):
+        # The writer wraps around while the reader copies the slot
+        for seq in range(2, 2 + ring.slots):
+            ring.put(frame(float(seq)))
+        return decode(records)
+
+    monkeypatch.setattr(ring._field_decoder, 'decode', overwrite_then_decode)
+    assert ring.read(1) is None
+
+
+def test_truncation_is_counted_in_shared_memory(ring):
+    ring.put(frame(1.0, count=5))
+    ring.put(frame(2.0, count=3))
+    ring.put(frame(3.0, count=4))
+    assert ring.truncated == 2
+    assert len(ring.read(1).objects) == ring.max_objects
+
+    # A reader in another process attaches to the same segment and sees the writer's count
+    reader = FrameRing(FIELD_NAMES, ring.slots, ring.max_objects, ring.shm.name, ring.written)
+    try:
+        assert reader.truncated == 2
+        assert reader.head() == 3
+        assert len(reader.read(3).objects) == ring.max_objects
+    finally:
+        reader.close()
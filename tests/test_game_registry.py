@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+LRU and idle eviction of the game registry, with running and stopped games. Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip('sledilnik')
+
+from src.classes import GameRegistry as game_registry_module
+from src.classes.GameRegistry import GameRegistry
+
+
+class Game:
+    """Stands in for a GameServer, the registry only reads these attributes"""
+
+    def __init__(self, game_id: str, running: bool = False, paused: bool = False):
+        self.id = game_id
+        self.game_on = running or paused
+        self.game_paused = paused
+        self.started = False
+        self.dead = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(game_registry_module, 'timer', clock)
+    return clock
+
+
+def registry(capacity: int = 3, idle_ttl: float = 60.0):
+    released = []
+    return GameRegistry(capacity, idle_ttl, released.append), released
+
+
+def test_full_registry_evicts_least_recently_used(clock):
+    games, released = registry()
+    for game_id in 'abc':
+        games.add(Game(game_id))
+        clock.now += 1
+
+    # Looking a game up marks it as used
+    assert games['a'].id == 'a'
+    games.add(Game('d'))
+
+    assert games.keys() == ['c', 'a', 'd']
+    assert [game.id for game in released] == ['b']
+    assert games.evicted == 1
+
+
+def test_running_games_are_evicted_last(clock):
+    games, released = registry()
+    games.add(Game('a', running=True))
+    games.add(Game('b', running=True))
+    games.add(Game('c'))
+    games['a']
+    games.add(Game('d'))
+
+    # c is the most recently used idle game, running a and b are kept
+    assert [game.id for game in released] == ['c']
+
+    games.add(Game('e'))
+    # d is the only game that is not running, although it is the most recently used
+    assert [game.id for game in released] == ['c', 'd']
+
+
+def test_all_running_evicts_least_recently_used(clock):
+    games, released = registry(capacity=2)
+    games.add(Game('a', running=True))
+    games.add(Game('b', running=True))
+    games['a']
+    games.add(Game('c', running=True))
+
+    assert [game.id for game in released] == ['b']
+    assert games.keys() == ['a', 'c']
+
+
+def test_paused_games_count_as_not_running(clock):
+    games, released = registry(capacity=2)
+    games.add(Game('a', paused=True))
+    games.add(Game('b', running=True))
+    games.add(Game('c'))
+
+    assert [game.id for game in released] == ['a']
+
+
+def test_idle_games_expire_after_ttl(clock):
+    games, released = registry(capacity=10, idle_ttl=60.0)
+    games.add(Game('idle'))
+    games.add(Game('running', running=True))
+    games.add(Game('used'))
+
+    clock.now = 50.0
+    games.touch('used')
+    clock.now = 60.0
+    games.expire()
+    # Exactly idle_ttl is not expired yet
+    assert released == []
+
+    clock.now = 60.5
+    games.expire()
+    assert [game.id for game in released] == ['idle']
+
+    clock.now = 1000.0
+    games.expire()
+    # Running games never expire
+    assert [game.id for game in released] == ['idle', 'used']
+    assert games.keys() == ['running']
+    assert games.evicted == 2
+
+
+def test_adding_expires_idle_games_first(clock):
+    games, released = registry(capacity=2, idle_ttl=10.0)
+    games.add(Game('old'))
+    clock.now = 5.0
+    games.add(Game('newer'))
+    clock.now = 12.0
+    games.add(Game('new'))
+
+    # The expired game made room, nothing else was evicted
+    assert [game.id for game in released] == ['old']
+    assert games.keys() == ['newer', 'new']
+
+
+def test_removed_games_are_counted_separately(clock):
+    games, released = registry()
+    games.add(Game('a'))
+    games.add(Game('a'))
+    assert len(games) == 1
+    assert games.removed == 1
+
+    games.pop('a')
+    assert 'a' not in games
+    assert games.removed == 2
+    assert games.evicted == 0
+    assert len(released) == 2
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Velocity and turn rate estimates across the 359 -> 0 degree wrap. Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.classes.MotionEstimator import MotionEstimator
+
+
+def test_turn_rate_unwraps_direction():
+    motion = MotionEstimator(smoothing=1.0)
+    motion.update([1], np.zeros((1, 2)), np.array([350.0]), 0.0)
+    frame = motion.update([1], np.zeros((1, 2)), np.array([350.0]), 0.1)
+    frame = motion.update([1], np.zeros((1, 2)), np.array([5.0]), 0.2)
+
+    # 350 -> 5 is a 15 degree turn, not -345
+    assert frame.turn_rate[0] == pytest.approx(150.0)
+
+
+def test_extrapolated_direction_stays_in_range():
+    motion = MotionEstimator(smoothing=1.0, max_horizon=1.0)
+    motion.update([1], np.zeros((1, 2)), np.array([340.0]), 0.0)
+    frame = motion.update([1], np.zeros((1, 2)), np.array([350.0]), 0.1)
+
+    _, direction = frame.extrapolate(0.3)
+    assert direction[0] == pytest.approx(10.0)
+    assert frame.extrapolated_json(0.3)[1]['direction'] == pytest.approx(10.0)
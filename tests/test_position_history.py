@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Ring buffers of the position history: wrap-around and time range queries. Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.classes.PositionHistory import PositionHistory
+
+
+def append(history: PositionHistory, timestamp: float, ids=(1,)):
+    ids = list(ids)
+    position = np.array([[timestamp, 10.0 * key] for key in ids]).reshape(-1, 2)
+    history.append(ids, position, np.full(len(ids), timestamp % 360), timestamp)
+
+
+def test_query_before_wrap_around():
+    history = PositionHistory(length=4)
+    for timestamp in (1.0, 2.0, 3.0):
+        append(history, timestamp)
+
+    result = history.query()
+    assert list(result) == [1]
+    assert result[1]['timestamp'].tolist() == [1.0, 2.0, 3.0]
+    assert result[1]['x'].tolist() == [1.0, 2.0, 3.0]
+    assert result[1]['y'].tolist() == [10.0, 10.0, 10.0]
+
+
+def test_wrap_around_keeps_the_newest_samples_in_order():
+    history = PositionHistory(length=4)
+    for timestamp in range(1, 8):
+        append(history, float(timestamp))
+
+    result = history.query([1])
+    assert result[1]['timestamp'].tolist() == [4.0, 5.0, 6.0, 7.0]
+    assert result[1]['direction'].tolist() == [4.0, 5.0, 6.0, 7.0]
+
+
+@pytest.mark.parametrize('since, until, expected', [
+    # Oldest sample in the last slot of the buffer, the newer ones wrapped to the start
+    (5.0, 6.0, [5.0, 6.0]),
+    (4.5, 6.5, [5.0, 6.0]),
+    (6.0, np.inf, [6.0, 7.0]),
+    (-np.inf, 4.0, [4.0]),
+    # Ranges across the end of the buffer
+    (4.0, 5.0, [4.0, 5.0]),
+    (3.5, 7.0, [4.0, 5.0, 6.0, 7.0]),
+    # Empty and out of range
+    (6.5, 6.7, []),
+    (8.0, 9.0, []),
+    (1.0, 3.0, []),
+])
+def test_since_until_after_wrap_around(since, until, expected):
+    history = PositionHistory(length=4)
+    for timestamp in range(1, 8):
+        append(history, float(timestamp))
+
+    assert history.query([1], since, until)[1]['timestamp'].tolist() == expected
+
+
+def test_full_buffer_at_the_start_of_the_ring():
+    # Head back at 0: the one run is the whole buffer
+    history = PositionHistory(length=4)
+    for timestamp in range(1, 9):
+        append(history, float(timestamp))
+
+    assert history.query([1], 6.0, 8.0)[1]['timestamp'].tolist() == [6.0, 7.0, 8.0]
+
+
+def test_repeated_and_older_frames_are_not_stored():
+    history = PositionHistory(length=4)
+    append(history, 1.0)
+    append(history, 2.0)
+    append(history, 2.0)
+    append(history, 1.5)
+
+    assert history.query([1])[1]['timestamp'].tolist() == [1.0, 2.0]
+
+
+def test_markers_have_their_own_rings():
+    history = PositionHistory(length=3)
+    append(history, 1.0, ids=(1, 2))
+    append(history, 2.0, ids=(2,))
+    append(history, 3.0, ids=(2, 3))
+    append(history, 4.0, ids=(2,))
+
+    result = history.query([1, 2, 3, 4])
+    assert sorted(result) == [1, 2, 3]
+    assert result[1]['timestamp'].tolist() == [1.0]
+    assert result[2]['timestamp'].tolist() == [2.0, 3.0, 4.0]
+    assert result[3]['y'].tolist() == [30.0]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Smoke test of the sharded game scheduler: shard processes have to start and update a running game. Run from the
+repository root:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('gevent')
+pytest.importorskip('sledilnik')
+
+import gevent
+
+from src.classes.SyntheticTracker import SyntheticTracker
+from src.games.beach.Beach import Beach
+from src.servers.ShardedScheduler import ShardedScheduler
+from src.servers.StateServer import StateServer
+from src.utils import read_config
+
+# Seconds a spawned shard gets to import the game server and answer its first frames
+STARTUP_TIMEOUT = 60
+
+
+def test_shards_update_running_games():
+    config = read_config('./src/games/beach/game_config.yaml')
+    config['log_level'] = 'WARNING'
+    tracker = SyntheticTracker(robots=4, objects=4)
+    tracker.prepare(config)
+    frames = tracker.frames()
+
+    state_server = StateServer(None, config)
+    scheduler = ShardedScheduler(state_server, config, 2)
+    game = Beach(state_server, config, list(config['robots'])[:2])
+    game.game_time = 1e9
+    game.start_game()
+    scheduler.add(game)
+    scheduler.start()
+
+    try:
+        with gevent.Timeout(STARTUP_TIMEOUT):
+            # The first frames may time out while the shards import
+            while game.tick_time == 0.0:
+                assert not scheduler.dead, scheduler.exception
+                state_server.process(next(frames))
+                state_server.updated.publish()
+                scheduler.updated.wait(scheduler.updated.seq)
+
+        assert all(shard.process.is_alive() for shard in scheduler.shards)
+        assert game.frame.encoded is not None
+        assert str(game.id).encode() in game.frame.encoded
+    finally:
+        scheduler.kill()
+        for shard in scheduler.shards:
+            if shard.process is not None:
+                shard.process.terminate()